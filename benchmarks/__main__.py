@@ -0,0 +1,142 @@
+import argparse
+import fnmatch
+import json
+import platform
+import sys
+import time
+import numpy
+from benchmarks.workloads import BENCHMARKS
+
+# a result this much worse than the baseline is flagged as a regression
+DEFAULT_THRESHOLD = 0.1
+
+
+def run(args) -> int:
+    results = {}
+    for name, bench in BENCHMARKS.items():
+        if args.filter and not any(
+            fnmatch.fnmatch(name, pattern) for pattern in args.filter
+        ):
+            continue
+        try:
+            values = [bench.function(args.scale) for i in range(args.repeat)]
+        except Exception as e:
+            # e.g. rendering without pygame installed
+            print(f"{name:<24} skipped: {type(e).__name__}: {e}", file=sys.stderr)
+            continue
+
+        # the best run is the least disturbed by the rest of the machine
+        value = max(values) if bench.higher_is_better else min(values)
+        results[name] = {
+            "value": value,
+            "unit": bench.unit,
+            "higher_is_better": bench.higher_is_better,
+            "runs": values,
+        }
+        print(f"{name:<24} {value:>14.2f} {bench.unit}", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": numpy.__version__,
+            "platform": platform.platform(),
+            "scale": args.scale,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+def compare(args) -> int:
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    with open(args.current) as f:
+        current = json.load(f)["results"]
+
+    regressions = []
+    for name, result in current.items():
+        if name not in baseline:
+            print(f"{name:<24} {'new':>10}")
+            continue
+        old, new = baseline[name]["value"], result["value"]
+        # positive change is better, whichever way the unit goes
+        change = (new - old) / old if old else 0.0
+        if not result["higher_is_better"]:
+            change = -change
+        flag = ""
+        if change < -args.threshold:
+            flag = "REGRESSION"
+            regressions.append(name)
+        print(
+            f"{name:<24} {old:>14.2f} -> {new:>14.2f} {result['unit']:<9}"
+            f" {change:>+8.1%} {flag}"
+        )
+    for name in baseline:
+        if name not in current:
+            print(f"{name:<24} {'missing':>10}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Seeded throughput benchmarks for the tetris engine and envs",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument(
+        "-o", "--output", help="file to write the JSON results to (default stdout)"
+    )
+    run_parser.add_argument(
+        "-k",
+        "--filter",
+        action="append",
+        help="only run benchmarks matching this glob, can be repeated",
+    )
+    run_parser.add_argument(
+        "--scale", type=float, default=1.0, help="multiplier for the amount of work"
+    )
+    run_parser.add_argument(
+        "--repeat", type=int, default=3, help="runs per benchmark, the best is kept"
+    )
+    run_parser.add_argument(
+        "--list", action="store_true", help="list the benchmarks and exit"
+    )
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="compare results against a baseline"
+    )
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="fraction worse than the baseline that counts as a regression",
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        if args.list:
+            for name, bench in BENCHMARKS.items():
+                print(f"{name:<24} {bench.unit}")
+            return 0
+        return run(args)
+    return compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
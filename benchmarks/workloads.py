@@ -0,0 +1,223 @@
+import os
+import random
+import time
+from typing import Callable, Dict, NamedTuple
+import numpy
+from tetris.envs import TetrisEnv, TetrisVecEnv
+from tetris.envs.game.constants import *
+from tetris.envs.game.coordinate import Coordinate
+from tetris.envs.game.game import GRID_BACKENDS, TetrisGame
+from tetris.envs.game.piece import IPiece
+
+SEED = 0
+
+
+class Benchmark(NamedTuple):
+    function: Callable[[float], float]
+    unit: str
+    higher_is_better: bool
+
+
+# name -> benchmark, in the order they are run
+BENCHMARKS: Dict[str, Benchmark] = {}
+
+
+def benchmark(name: str, unit: str, higher_is_better: bool = True):
+    """
+    Registers a workload. Workloads take a scale for their amount of work
+    and return one measurement in unit.
+    """
+
+    def register(function):
+        BENCHMARKS[name] = Benchmark(function, unit, higher_is_better)
+        return function
+
+    return register
+
+
+def _iterations(count: int, scale: float) -> int:
+    return max(1, int(count * scale))
+
+
+def _random_actions(count: int) -> list:
+    rng = numpy.random.default_rng(SEED)
+    return rng.integers(0, NUM_ACTIONS, count).tolist()
+
+
+def _new_game(**kwargs) -> TetrisGame:
+    random.seed(SEED)
+    return TetrisGame(**kwargs)
+
+
+def _game_ticks(grid_backend: str, scale: float) -> float:
+    actions = _random_actions(_iterations(20000, scale))
+    game = _new_game(grid_backend=grid_backend)
+    start = time.perf_counter()
+    for action in actions:
+        game.step([action])
+        if not game.run:
+            game.reset()
+    elapsed = time.perf_counter() - start
+    return len(actions) / elapsed
+
+
+for _backend in GRID_BACKENDS:
+    benchmark(f"game_step[{_backend}]", "ticks/s")(
+        lambda scale, backend=_backend: _game_ticks(backend, scale)
+    )
+
+
+def _env_steps(reward_mode: str, count: int, scale: float) -> float:
+    actions = _random_actions(_iterations(count, scale))
+    env = TetrisEnv(reward_mode=reward_mode)
+    random.seed(SEED)
+    env.reset()
+    start = time.perf_counter()
+    for action in actions:
+        done = env.step(action)[2]
+        if done:
+            env.reset()
+    elapsed = time.perf_counter() - start
+    return len(actions) / elapsed
+
+
+for _reward_mode in TetrisEnv.metadata["reward_modes"]:
+    # the distance reward searches for the best position once per piece and grid
+    benchmark(f"env_step[{_reward_mode}]", "steps/s")(
+        lambda scale, reward_mode=_reward_mode: _env_steps(
+            reward_mode, 500 if reward_mode == "distance" else 10000, scale
+        )
+    )
+
+
+@benchmark("env_step_frame_skip", "steps/s")
+def env_step_frame_skip(scale: float) -> float:
+    # idle ticks are fast forwarded with the sparse reward
+    actions = _random_actions(_iterations(5000, scale))
+    env = TetrisEnv(frame_skip=8)
+    random.seed(SEED)
+    env.reset()
+    start = time.perf_counter()
+    for action in actions:
+        if env.step(action)[2]:
+            env.reset()
+    elapsed = time.perf_counter() - start
+    return len(actions) / elapsed
+
+
+@benchmark("env_reset", "us", higher_is_better=False)
+def env_reset(scale: float) -> float:
+    count = _iterations(2000, scale)
+    env = TetrisEnv()
+    random.seed(SEED)
+    start = time.perf_counter()
+    for i in range(count):
+        env.reset()
+    elapsed = time.perf_counter() - start
+    return elapsed / count * 1e6
+
+
+@benchmark("action_mask", "us", higher_is_better=False)
+def action_mask(scale: float) -> float:
+    actions = _random_actions(_iterations(10000, scale))
+    elapsed = 0.0
+    env = TetrisEnv()
+    random.seed(SEED)
+    env.reset()
+    for action in actions:
+        start = time.perf_counter()
+        env.get_invalid_action_mask()
+        elapsed += time.perf_counter() - start
+        if env.step(action)[2]:
+            env.reset()
+    return elapsed / len(actions) * 1e6
+
+
+@benchmark("best_position", "calls/s")
+def best_position(scale: float) -> float:
+    # boards from a game played by the heuristic itself
+    count = _iterations(100, scale)
+    elapsed = 0.0
+    calls = 0
+    game = _new_game()
+    while calls < count:
+        piece = game.cur_piece
+        start = time.perf_counter()
+        top_left, arrangement = piece.get_best_position()
+        elapsed += time.perf_counter() - start
+        calls += 1
+
+        piece.top_left, piece.arrangement = top_left, arrangement
+        piece._get_blocks()
+        game.step([ACTION_HARD_DROP])
+        if not game.run:
+            game.reset()
+    return calls / elapsed
+
+
+@benchmark("line_clears", "clears/s")
+def line_clears(scale: float) -> float:
+    # four rows filled apart from a column, then an upright I piece
+    # dropped down it. The game is restored before every drop
+    count = _iterations(5000, scale)
+    game = _new_game()
+    grid = game.dropped_piece_grid
+    grid_width, grid_height = PLAYER_GRID_DIMENSIONS
+    for x in range(1, grid_width):
+        piece = IPiece((0, 0), grid)
+        piece.rotation = 1
+        piece.set_top_left(Coordinate(x, grid_height - 4))
+        grid += piece
+    game.cur_piece = IPiece(BLOCK_START, grid, game.score_keeper)
+    game.cur_piece.rotation = 1
+    game.cur_piece.set_top_left(Coordinate(0, 0))
+    snapshot = game.snapshot()
+
+    start = time.perf_counter()
+    for i in range(count):
+        game.restore(snapshot)
+        game.step([ACTION_HARD_DROP])
+    elapsed = time.perf_counter() - start
+    assert game.dropped_piece_grid.lines_just_cleared == 4
+    return count / elapsed
+
+
+@benchmark("vec_env_step", "steps/s")
+def vec_env_step(scale: float) -> float:
+    num_envs = 64
+    count = _iterations(1000, scale)
+    rng = numpy.random.default_rng(SEED)
+    env = TetrisVecEnv(num_envs, seed=SEED)
+    env.reset()
+    actions = rng.integers(0, NUM_ACTIONS, (count, num_envs))
+    start = time.perf_counter()
+    for step_actions in actions:
+        env.step(step_actions)
+    elapsed = time.perf_counter() - start
+    return count * num_envs / elapsed
+
+
+def _render_frames(render_mode: str, scale: float) -> float:
+    if render_mode == "human" and not (
+        os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")
+    ):
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    actions = _random_actions(_iterations(300, scale))
+    game = _new_game(render_mode=render_mode)
+    start = time.perf_counter()
+    for action in actions:
+        game.step([action])
+        game.render()
+        if not game.run:
+            game.reset()
+    elapsed = time.perf_counter() - start
+    game.close()
+    return len(actions) / elapsed
+
+
+# human frames are drawn by pygame, only redrawing what changed, and rgb arrays
+# are drawn with NumPy. Without a display, pygame draws to an offscreen window
+for _render_mode in ("human", "rgb-array"):
+    benchmark(f"render[{_render_mode}]", "frames/s")(
+        lambda scale, render_mode=_render_mode: _render_frames(render_mode, scale)
+    )
@@ -0,0 +1,38 @@
+import random
+from tetris.envs.game.constants import *
+from tetris.envs.game.game import TetrisGame
+from tetris.envs.game.planner import BeamSearchPlanner
+
+
+def test_bitboard_grid_follows_object_grid():
+    rng = random.Random(0)
+    planner = BeamSearchPlanner(max_depth=1)
+    lines = 0
+    for episode in range(3):
+        games = [
+            TetrisGame(grid_backend=backend, seed=episode)
+            for backend in ("object", "bitboard")
+        ]
+        game, bitboard_game = games
+        for tick in range(1500):
+            if not game.run:
+                break
+            # mostly the planner, which clears lines, with random keys mixed in
+            if rng.random() < 0.7:
+                action = planner.next_action(game)
+            else:
+                action = rng.randrange(NUM_ACTIONS)
+            for g in games:
+                g.step([action])
+
+            grid = game.dropped_piece_grid
+            bitboard_grid = bitboard_game.dropped_piece_grid
+            assert bitboard_grid.numeric_used_spaces == grid.numeric_used_spaces
+            assert bitboard_grid.lines_just_cleared == grid.lines_just_cleared
+            assert bitboard_grid.empty_spaces_beneath == grid.empty_spaces_beneath
+            assert bitboard_game.score_keeper.score == game.score_keeper.score
+            assert bitboard_game.run == game.run
+        lines += game.total_lines_cleared
+
+    # the grids were compared across line clears
+    assert lines
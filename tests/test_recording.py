@@ -0,0 +1,47 @@
+import os
+from tetris.envs import TetrisEnv
+from tetris.envs.game.recording import EpisodeReader, EpisodeWriter, replay
+
+
+def _record_episode(writer: EpisodeWriter, seed: int, steps: int = 50):
+    env = TetrisEnv(episode_writer=writer, seed=seed)
+    for i in range(steps):
+        if env.step(i % 8)[2]:
+            break
+    env.close()
+
+
+def test_append_after_truncated_record(tmp_path):
+    path = str(tmp_path / "worker0.episodes")
+    with EpisodeWriter(path) as writer:
+        _record_episode(writer, seed=1)
+        _record_episode(writer, seed=2)
+    with EpisodeReader(path) as reader:
+        first, second = reader.offsets
+        first_episode = reader[0]
+
+    # a crash in the middle of writing the second record
+    with open(path, "r+b") as file:
+        file.truncate(second + (os.path.getsize(path) - second) // 2)
+    # the restarted worker appends to the same file
+    with EpisodeWriter(path) as writer:
+        _record_episode(writer, seed=3)
+
+    with EpisodeReader(path) as reader:
+        assert len(reader) == 2
+        assert reader[0] == first_episode
+        for episode in reader:
+            replay(episode)
+
+
+def test_recording_keeps_the_pieces_of_a_seeded_env(tmp_path):
+    def pieces(env):
+        ret = []
+        for episode in range(3):
+            env.reset()
+            ret.append(env.game.next_pieces.pregenerate(20))
+        return ret
+
+    with EpisodeWriter(str(tmp_path / "episodes")) as writer:
+        recorded = pieces(TetrisEnv(seed=5, episode_writer=writer))
+    assert recorded == pieces(TetrisEnv(seed=5))
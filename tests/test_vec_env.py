@@ -0,0 +1,81 @@
+import random
+import numpy
+import pytest
+from tetris.envs import TetrisEnv, TetrisVecEnv
+from tetris.envs.game.constants import *
+from tetris.envs.game.next_pieces import PIECE_OPTIONS
+from tetris.envs.game.planner import BeamSearchPlanner
+from tetris.envs.tetris_env import PIECE_TO_NUMBER
+
+
+class _PieceStream:
+    """
+    Stands in for TetrisVecEnv's generator, dealing pieces from a fixed sequence
+    """
+
+    def __init__(self, pieces):
+        self.values = iter([PIECE_TO_NUMBER[piece] - 1 for piece in pieces])
+
+    def integers(self, low, high, size):
+        count = int(numpy.prod(size))
+        return numpy.array([next(self.values) for i in range(count)]).reshape(size)
+
+
+def _deal(env: TetrisEnv, pieces):
+    """
+    Gives env's game the pieces a reset TetrisVecEnv deals from the same sequence
+    """
+    game = env.game
+    next_pieces = game.next_pieces
+    sequence = bytes(PIECE_OPTIONS.index(piece) for piece in pieces)
+    next_pieces.set_state(
+        (tuple(pieces[1:4]), sequence, 4, next_pieces.rng.getstate())
+    )
+    game.cur_piece = game.instantiate_piece(pieces[0])
+
+
+@pytest.mark.parametrize("reward_mode", ["sparse", "sparsev2"])
+def test_vec_env_follows_tetris_env(reward_mode):
+    rng = random.Random(0)
+    planner = BeamSearchPlanner(max_depth=1)
+    holds = hard_drops = gravity_falls = lines = 0
+    for episode in range(3):
+        pieces = rng.choices(PIECE_OPTIONS, k=2000)
+        env = TetrisEnv(reward_mode=reward_mode, max_timesteps=1500)
+        env.reset()
+        _deal(env, pieces)
+        vec_env = TetrisVecEnv(1, reward_mode=reward_mode, max_timesteps=1500)
+        vec_env.rng = _PieceStream(pieces)
+        vec_obs = vec_env.reset()
+        assert numpy.array_equal(vec_obs[0], env._get_obs())
+
+        done = False
+        while not done:
+            # mostly the planner, which clears lines, with random keys mixed in
+            if rng.random() < 0.7:
+                action = planner.next_action(env.game)
+            else:
+                action = rng.randrange(NUM_ACTIONS)
+            y = env.game.cur_piece.top_left.y
+            piece = env.game.cur_piece
+            obs, reward, done, info = env.step(action)
+            vec_obs, vec_rewards, vec_dones, vec_infos = vec_env.step([action])
+            if done:
+                vec_obs = vec_infos["final_observation"]
+
+            assert numpy.array_equal(vec_obs[0], obs)
+            assert vec_rewards[0] == pytest.approx(reward)
+            assert vec_dones[0] == done
+
+            holds += action == ACTION_HOLD and env.game.cur_piece is not piece
+            hard_drops += action == ACTION_HARD_DROP
+            gravity_falls += (
+                action == ACTION_NOTHING and env.game.cur_piece.top_left.y > y
+            )
+            if not done:
+                # finished vec env games are reset, along with their lines
+                assert vec_env.total_lines_cleared[0] == env.game.total_lines_cleared
+        lines += env.game.total_lines_cleared
+
+    # every rule was exercised
+    assert holds and hard_drops and gravity_falls and lines
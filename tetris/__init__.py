@@ -4,3 +4,8 @@ register(
     id="tetris-v0",
     entry_point="tetris.envs:TetrisEnv",
 )
+
+register(
+    id="tetris-placement-v0",
+    entry_point="tetris.envs:TetrisPlacementEnv",
+)
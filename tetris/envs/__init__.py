@@ -1 +1,4 @@
 from tetris.envs.tetris_env import TetrisEnv
+from tetris.envs.tetris_placement_env import TetrisPlacementEnv
+from tetris.envs.tetris_vec_env import TetrisVecEnv
+from tetris.envs.tetris_subproc_vec_env import TetrisSubprocVecEnv
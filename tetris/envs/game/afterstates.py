@@ -0,0 +1,88 @@
+from typing import List, NamedTuple, Sequence, Tuple
+import numpy
+from tetris.envs.game.bitboard import GRID_HEIGHT, GRID_WIDTH, ROW_TUPLES
+from tetris.envs.game.placements import Placement, place
+
+# column heights, holes, bumpiness and wells, like planner.board_features
+NUM_FEATURES = GRID_WIDTH + 3
+
+_ROW_SPACES = numpy.array(ROW_TUPLES, dtype=numpy.uint8)
+
+
+class Afterstates(NamedTuple):
+    """
+    The boards left by locking pieces at some placements, one entry each,
+    as arrays that can be fed to a network as one batch
+    """
+
+    # (K, grid height, grid width), 1 where a space is filled
+    boards: numpy.ndarray
+    # (K,) rows cleared by the placement
+    lines_cleared: numpy.ndarray
+    # (K, NUM_FEATURES) features of the boards
+    features: numpy.ndarray
+    # (K,) whether the piece is held before placing
+    hold: numpy.ndarray
+    piece_types: List[type]
+    placements: List[Placement]
+    # the boards as one bitmask per row, for searching further
+    rows: List[Tuple[int, ...]]
+
+
+def board_feature_array(boards: numpy.ndarray, dtype=numpy.float32) -> numpy.ndarray:
+    """
+    Returns the features of a (K, grid height, grid width) batch of boards,
+    the same as planner.board_features of each one
+    """
+    filled = boards != 0
+    num_boards = len(boards)
+    # a column's height is from the bottom to its highest filled space
+    heights = numpy.where(
+        filled.any(axis=1), GRID_HEIGHT - filled.argmax(axis=1), 0
+    )
+    # empty spaces below the top of their column
+    covered = numpy.logical_or.accumulate(filled, axis=1)
+    holes = (covered & ~filled).sum(axis=(1, 2))
+    bumpiness = numpy.abs(numpy.diff(heights, axis=1)).sum(axis=1)
+    walls = numpy.full((num_boards, 1), GRID_HEIGHT)
+    padded = numpy.concatenate((walls, heights, walls), axis=1)
+    depths = numpy.minimum(padded[:, :-2], padded[:, 2:]) - heights
+    wells = numpy.maximum(depths, 0).sum(axis=1)
+
+    features = numpy.empty((num_boards, NUM_FEATURES), dtype=dtype)
+    features[:, :GRID_WIDTH] = heights
+    features[:, GRID_WIDTH] = holes
+    features[:, GRID_WIDTH + 1] = bumpiness
+    features[:, GRID_WIDTH + 2] = wells
+    return features
+
+
+def get_afterstates(
+    rows: Sequence[int],
+    candidates: Sequence[Tuple[bool, type, Placement]],
+    dtype=numpy.float32,
+) -> Afterstates:
+    """
+    Returns the afterstates of locking pieces on the grid given as one bitmask per
+    row, for candidates of (whether it holds first, piece type, placement).
+    Boards and features are given as dtype.
+    """
+    new_rows = []
+    lines_cleared = []
+    for hold, piece_type, placement in candidates:
+        placed_rows, rows_cleared = place(rows, piece_type, placement)
+        new_rows.append(placed_rows)
+        lines_cleared.append(rows_cleared)
+
+    # every board is gathered from the row masks in one go
+    masks = numpy.array(new_rows, dtype=numpy.intp).reshape(-1, GRID_HEIGHT)
+    spaces = _ROW_SPACES[masks]
+    return Afterstates(
+        spaces.astype(dtype),
+        numpy.array(lines_cleared, dtype=numpy.int64),
+        board_feature_array(spaces, dtype),
+        numpy.array([hold for hold, _, _ in candidates], dtype=bool),
+        [piece_type for _, piece_type, _ in candidates],
+        [placement for _, _, placement in candidates],
+        new_rows,
+    )
@@ -0,0 +1,60 @@
+from typing import Dict, Sequence, Tuple
+from tetris.envs.game.constants import *
+
+# helpers for storing the grid as one integer per row.
+# bit x of a row is set when column x of that row is filled
+
+GRID_WIDTH, GRID_HEIGHT = PLAYER_GRID_DIMENSIONS
+FULL_ROW = (1 << GRID_WIDTH) - 1
+
+# lookup tables indexed by a row mask
+ROW_TUPLES = tuple(
+    tuple((mask >> x) & 1 for x in range(GRID_WIDTH)) for mask in range(FULL_ROW + 1)
+)
+POPCOUNT = tuple(sum(row) for row in ROW_TUPLES)
+
+# (width, height, ((dy, row mask), ...)) for a given arrangement
+PieceMasks = Tuple[int, int, Tuple[Tuple[int, int], ...]]
+_piece_masks_cache: Dict[tuple, PieceMasks] = {}
+
+
+def piece_masks(arrangement: Sequence[Sequence[int]]) -> PieceMasks:
+    """
+    Returns the row masks of an arrangement, relative to its top left.
+    Masks are memoized per arrangement, so each rotation state
+    is only ever converted once.
+    """
+    try:
+        return _piece_masks_cache[arrangement]
+    except (KeyError, TypeError):
+        pass
+
+    key = tuple(map(tuple, arrangement))
+    masks = _piece_masks_cache.get(key)
+    if masks is None:
+        width = max(coord[0] for coord in key) + 1
+        height = max(coord[1] for coord in key) + 1
+        row_masks = [0] * height
+        for x, y in key:
+            row_masks[y] |= 1 << x
+        masks = (
+            width,
+            height,
+            tuple((dy, mask) for dy, mask in enumerate(row_masks) if mask),
+        )
+        _piece_masks_cache[key] = masks
+    return masks
+
+
+def collides(rows: Sequence[int], masks: PieceMasks, x: int, y: int) -> bool:
+    """
+    Returns whether the piece described by masks, with its top left
+    at grid position (x, y), overlaps a filled space or leaves the grid
+    """
+    width, height, row_masks = masks
+    if x < 0 or y < 0 or x + width > GRID_WIDTH or y + height > GRID_HEIGHT:
+        return True
+    for dy, mask in row_masks:
+        if rows[y + dy] & (mask << x):
+            return True
+    return False
@@ -0,0 +1,145 @@
+from tetris.envs.game.constants import *
+from tetris.envs.game.base_piece import BasePiece, Block
+from tetris.envs.game.bitboard import *
+from tetris.envs.game.coordinate import Coordinate
+from tetris.envs.game.dropped_piece_grid import DroppedPieceGrid
+
+
+class BitboardGrid(DroppedPieceGrid):
+    """
+    DroppedPieceGrid that stores each row as an integer bitmask,
+    so collision, placement and full-row checks are a handful of integer ops.
+    Blocks are only kept around when there is something to draw them on.
+    """
+
+    def _init_spaces(self):
+        self.rows = [0] * GRID_HEIGHT
+
+        # blocks are only needed for drawing
+        self.block_rows = None
+        if self.render_mode == "human" or self.render_mode == "rgb-array":
+            self.block_rows = [[None] * GRID_WIDTH for y in range(GRID_HEIGHT)]
+
+    def _get_colors(self):
+        if self.block_rows is None:
+            return None
+        return tuple(
+            [
+                tuple([None if block is None else block.color for block in row])
+                for row in self.block_rows
+            ]
+        )
+
+    def _set_spaces(self, rows, colors):
+        self.rows = list(rows)
+        if self.block_rows is not None:
+            assert colors is not None, "the state has no colors to draw blocks with"
+            self.block_rows = [
+                [
+                    None
+                    if color is None
+                    else Block(color, Coordinate(x, y))
+                    for x, color in enumerate(row)
+                ]
+                for y, row in enumerate(colors)
+            ]
+
+    def contains_piece(self, piece: BasePiece, **kwargs):
+        """
+        @brief checks if a piece is in the grid
+        @param piece - the piece to be checked
+        @param kwargs - valid options are: top_left, arrangement
+        """
+        top_left = kwargs["top_left"] if "top_left" in kwargs else piece.top_left
+        if "arrangement" in kwargs:
+            arrangement = kwargs["arrangement"]
+        else:
+            arrangement = piece.arrangement
+
+        return collides(self.rows, piece_masks(arrangement), top_left.x, top_left.y)
+
+    def __getitem__(self, coord: Coordinate) -> bool:
+        if coord.x < 0 or coord.y < 0:
+            return True
+        if coord.x >= GRID_WIDTH:
+            raise IndexError("x coordinate out of range")
+        return bool((self.rows[coord.y] >> coord.x) & 1)
+
+    def _count_empty_spaces_beneath(self, piece: BasePiece) -> int:
+        # the spaces of a piece in a column are contiguous, so it is enough
+        # to walk down from the lowest space of the piece in each column
+        lowest = {}
+        for y, x in self.last_piece_spaces:
+            if lowest.get(x, -1) < y:
+                lowest[x] = y
+
+        empty_spaces_beneath = 0
+        rows = self.rows
+        for x, y in lowest.items():
+            bit = 1 << x
+            y += 1
+            while y < GRID_HEIGHT and not rows[y] & bit:
+                empty_spaces_beneath += 1
+                y += 1
+        return empty_spaces_beneath
+
+    def _clear_full_rows(self) -> int:
+        kept = [y for y in range(GRID_HEIGHT) if self.rows[y] != FULL_ROW]
+        rows_cleared = GRID_HEIGHT - len(kept)
+        if rows_cleared:
+            self.rows = [0] * rows_cleared + [self.rows[y] for y in kept]
+
+            if self.block_rows is not None:
+                self.block_rows = [
+                    [None] * GRID_WIDTH for y in range(rows_cleared)
+                ] + [self.block_rows[y] for y in kept]
+                for y in range(rows_cleared, GRID_HEIGHT):
+                    for block in self.block_rows[y]:
+                        if block is not None:
+                            block.set_top_left(Coordinate(block.top_left.x, y))
+        return rows_cleared
+
+    def placed_blocks(self):
+        assert self.block_rows is not None, "blocks are only kept when rendering"
+        for row in self.block_rows:
+            for block in row:
+                if block is not None:
+                    yield block
+
+    def row_masks(self) -> list:
+        return self.rows
+
+    @property
+    def numeric_used_spaces(self):
+        return tuple([ROW_TUPLES[row] for row in self.rows])
+
+    def _add_to_grid(self, piece: BasePiece) -> int:
+        """
+        Returns the max height of the pieces
+        """
+        self.past_density = self.density
+        max_height = 0
+        if piece is not None:
+            self.last_piece_spaces = []
+            new_spaces = []
+
+            max_height = piece.blocks[0].top_left.y
+            for block in piece.blocks:
+                x, y = block.top_left
+                if not (self.rows[y] >> x) & 1:
+                    new_spaces.append((y, x))
+                self.rows[y] |= 1 << x
+                if self.block_rows is not None:
+                    self.block_rows[y][x] = block
+                self.last_piece_spaces.append((y, x))
+                max_height = max(y, max_height)
+            self._add_spaces_to_features(new_spaces)
+        self.density = self._get_density()
+        return max_height
+
+    def _undo_last_drop(self):
+        for y, x in self.last_piece_spaces:
+            self.rows[y] &= ~(1 << x)
+            if self.block_rows is not None:
+                self.block_rows[y][x] = None
+        self._restore_features()
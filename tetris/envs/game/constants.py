@@ -1,5 +1,3 @@
-import pygame
-
 # color values
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
@@ -56,18 +54,28 @@ PLAYER_DIMENSIONS = (
     + (PLAYER_GRID_DIMENSIONS[1] - 1) * LINE_SIZE,
 )
 PLAYER_SCREEN_POS = (SCORE_DIMENSIONS[0], 0)
-BLOCK_START = (3 * SPACE_SIZE, 0)
+BLOCK_START = (3, 0)  # in spaces, not pixels
 
-KEY_MAPPINGS = {
-    pygame.K_UP: "spin right",
-    pygame.K_DOWN: "soft drop",
-    pygame.K_LEFT: "left",
-    pygame.K_RIGHT: "right",
-    pygame.K_z: "spin left",
-    pygame.K_c: "hold",
-    pygame.K_SPACE: "hard drop",
-    pygame.K_q: "nothing",
+# action codes
+ACTION_SPIN_RIGHT = 0
+ACTION_SOFT_DROP = 1
+ACTION_LEFT = 2
+ACTION_RIGHT = 3
+ACTION_SPIN_LEFT = 4
+ACTION_HOLD = 5
+ACTION_HARD_DROP = 6
+ACTION_NOTHING = 7
+ACTION_NAMES = {
+    ACTION_SPIN_RIGHT: "spin right",
+    ACTION_SOFT_DROP: "soft drop",
+    ACTION_LEFT: "left",
+    ACTION_RIGHT: "right",
+    ACTION_SPIN_LEFT: "spin left",
+    ACTION_HOLD: "hold",
+    ACTION_HARD_DROP: "hard drop",
+    ACTION_NOTHING: "nothing",
 }
+NUM_ACTIONS = len(ACTION_NAMES)
 
 
 # next pieces constants
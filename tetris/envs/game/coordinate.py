@@ -1,10 +1,14 @@
-from typing import Optional, Union
+from typing import NamedTuple, Union
 
 
-class Coordinate:
-    def __init__(self, x: Optional[int] = 0, y: Optional[int] = 0) -> None:
-        self.x = x
-        self.y = y
+class Coordinate(NamedTuple):
+    """
+    A position on the grid, in spaces rather than pixels.
+    Coordinates are immutable, so they can be shared freely.
+    """
+
+    x: int = 0
+    y: int = 0
 
     def __floordiv__(self, num: Union[int, float]):
         return Coordinate(self.x // num, self.y // num)
@@ -12,16 +16,12 @@ class Coordinate:
     def __add__(self, o):
         if type(o) == Coordinate:
             return Coordinate(self.x + o.x, self.y + o.y)
+        return NotImplemented
 
     def __sub__(self, o):
         if type(o) == Coordinate:
             return Coordinate(self.x - o.x, self.y - o.y)
-
-    def __iadd__(self, o):
-        if type(o) == Coordinate:
-            self.x += o.x
-            self.y += o.y
-            return self
+        return NotImplemented
 
     def __str__(self):
         return f"({self.x}, {self.y})"
@@ -32,11 +32,4 @@ class Coordinate:
     def __mul__(self, o):
         if type(o) == int:
             return Coordinate(self.x * o, self.y * o)
-
-    def __eq__(self, o: object) -> bool:
-        if type(o) == Coordinate:
-            return self.x == o.x and self.y == o.y
-        return False
-
-    def __ne__(self, __o: object) -> bool:
-        return not self == __o
+        return NotImplemented
@@ -1,21 +1,41 @@
-from typing import Optional
-import pygame
+from typing import NamedTuple, Optional, Tuple
 from tetris.envs.game.constants import *
-from tetris.envs.game.base_piece import BasePiece
+from tetris.envs.game.base_piece import BasePiece, Block
 from tetris.envs.game.coordinate import Coordinate
 from tetris.envs.game.score import Score
+from tetris.envs.game.zobrist import CELL_KEYS, hash_rows
 import numpy
 
 
+# data variables that are saved along with the spaces of a grid
+_STATE_ATTRIBUTES = (
+    "height",
+    "past_height",
+    "delta_h",
+    "lines_just_cleared",
+    "last_piece_ending_height",
+    "empty_spaces_beneath",
+    "total_lines_cleared",
+    "past_density",
+    "density",
+)
+
+
+class GridState(NamedTuple):
+    """
+    Immutable copy of a grid, made by DroppedPieceGrid.get_state
+    """
+
+    rows: Tuple[int, ...]
+    colors: Optional[tuple]  # only kept by grids that keep blocks
+    data: tuple
+    last_piece_spaces: Tuple[Tuple[int, int], ...]
+    features: tuple
+
+
 class DroppedPieceGrid:
     def __init__(self, score_keeper: Score, render_mode: Optional[str] = None) -> None:
         self.score_keeper = score_keeper
-        self.used_spaces = numpy.array(
-            [
-                [None for x in range(PLAYER_GRID_DIMENSIONS[0])]
-                for y in range(PLAYER_GRID_DIMENSIONS[1])
-            ]
-        )
 
         # useful data variables
         self.height = 0
@@ -30,10 +50,152 @@ class DroppedPieceGrid:
         self.past_density = 0
         self.density = 0
 
+        # bumped whenever a piece is added, so caches of the grid can tell it changed
+        self.version = 0
+
         # render mode
         self.render_mode = render_mode
-        if self.render_mode == "human":
-            pygame.init()
+
+        self._init_spaces()
+        self._init_features()
+
+    def _init_spaces(self):
+        """
+        Creates the empty storage for the grid
+        """
+        self.used_spaces = numpy.array(
+            [
+                [None for x in range(PLAYER_GRID_DIMENSIONS[0])]
+                for y in range(PLAYER_GRID_DIMENSIONS[1])
+            ]
+        )
+
+    def _init_features(self):
+        """
+        Creates the board features that are kept up to date as pieces are added
+        """
+        self._column_heights = [0] * PLAYER_GRID_DIMENSIONS[0]
+        self._row_fills = [0] * PLAYER_GRID_DIMENSIONS[1]
+        self._filled_spaces = 0
+        self._holes = 0
+        self._wells = 0
+        self._bumpiness = 0
+        self._board_hash = 0
+        self._saved_features = None
+
+    @property
+    def column_heights(self) -> tuple:
+        """
+        Height of the highest used space in each column, 0 for an empty column
+        """
+        return tuple(self._column_heights)
+
+    @property
+    def row_fills(self) -> tuple:
+        """
+        Number of used spaces in each row, from the top row down
+        """
+        return tuple(self._row_fills)
+
+    @property
+    def filled_spaces(self) -> int:
+        return self._filled_spaces
+
+    @property
+    def holes(self) -> int:
+        """
+        Number of empty spaces below the top of their column
+        """
+        return self._holes
+
+    @property
+    def wells(self) -> int:
+        """
+        Summed depth of the columns lower than both of their neighbours (or walls)
+        """
+        return self._wells
+
+    @property
+    def bumpiness(self) -> int:
+        """
+        Summed height difference between neighbouring columns
+        """
+        return self._bumpiness
+
+    @property
+    def board_hash(self) -> int:
+        """
+        Zobrist hash of the used spaces, equal to hash_rows(self.row_masks())
+        """
+        return self._board_hash
+
+    def get_state(self) -> GridState:
+        """
+        Returns an immutable copy of the grid that set_state can go back to
+        """
+        return GridState(
+            tuple(self.row_masks()),
+            self._get_colors(),
+            tuple([getattr(self, name) for name in _STATE_ATTRIBUTES]),
+            tuple(self.last_piece_spaces),
+            (
+                tuple(self._column_heights),
+                tuple(self._row_fills),
+                self._filled_spaces,
+                self._holes,
+                self._wells,
+                self._bumpiness,
+                self._board_hash,
+            ),
+        )
+
+    def set_state(self, state: GridState):
+        """
+        Puts the grid back to a state returned by get_state
+        """
+        self._set_spaces(state.rows, state.colors)
+        for name, value in zip(_STATE_ATTRIBUTES, state.data):
+            setattr(self, name, value)
+        self.last_piece_spaces = list(state.last_piece_spaces)
+
+        column_heights, row_fills = state.features[:2]
+        self._column_heights = list(column_heights)
+        self._row_fills = list(row_fills)
+        (
+            self._filled_spaces,
+            self._holes,
+            self._wells,
+            self._bumpiness,
+            self._board_hash,
+        ) = state.features[2:]
+        self._saved_features = None
+
+        # the grid changed, so the version moves forward rather than back
+        self.version += 1
+
+    def _get_colors(self) -> Optional[tuple]:
+        """
+        Returns the color of every used space, None for empty spaces
+        """
+        return tuple(
+            [
+                tuple([None if block is None else block.color for block in row])
+                for row in self.used_spaces
+            ]
+        )
+
+    def _set_spaces(self, rows: Tuple[int, ...], colors: Optional[tuple]):
+        """
+        Replaces the spaces of the grid
+        """
+        assert colors is not None, "this grid needs the colors of its blocks"
+        for y, row in enumerate(colors):
+            for x, color in enumerate(row):
+                self.used_spaces[y, x] = (
+                    None
+                    if color is None
+                    else Block(color, Coordinate(x, y))
+                )
 
     def contains_piece(self, piece: BasePiece, **kwargs):
         """
@@ -42,9 +204,9 @@ class DroppedPieceGrid:
         @param kwargs - valid options are: top_left, arrangement
         """
         if "top_left" in kwargs:
-            true_coord = kwargs["top_left"] // SPACE_SIZE
+            true_coord = kwargs["top_left"]
         else:
-            true_coord = piece.top_left // SPACE_SIZE
+            true_coord = piece.top_left
 
         if "arrangement" in kwargs:
             true_arrangement = kwargs["arrangement"]
@@ -66,11 +228,7 @@ class DroppedPieceGrid:
         return self.density - self.past_density
 
     def __contains__(self, coord: Coordinate) -> bool:
-        true_coord = coord // SPACE_SIZE
-        return (
-            self[Coordinate(true_coord.x + coord[0], true_coord.y + coord[1])]
-            is not None
-        )
+        return self[coord]
 
     def __getitem__(self, coord: Coordinate) -> bool:
         return (
@@ -79,47 +237,15 @@ class DroppedPieceGrid:
 
     def __iadd__(self, piece: BasePiece):
         if piece is not None:
+            self.version += 1
             max_height = self._add_to_grid(piece)
 
             # check how many empty spaces beneath the piece
-            self.empty_spaces_beneath = 0
-            coords = []
-            for block in piece.blocks:
-                coords.append(block.top_left)
-            used_x_coords = set()
-            for coord in coords:
-                if coord.x not in used_x_coords:
-                    used_x_coords.add(coord.x)
-                    x = coord.x // SPACE_SIZE
-                    for y in range(coord.y // SPACE_SIZE, PLAYER_GRID_DIMENSIONS[1]):
-                        if self[Coordinate(x, y)]:
-                            if Coordinate(coord.x, y * SPACE_SIZE) not in coords:
-                                break
-                        else:
-                            self.empty_spaces_beneath += 1
+            self.empty_spaces_beneath = self._count_empty_spaces_beneath(piece)
 
             # check if any rows have been cleared
-            rows_cleared = 0
-            for y in range(len(self.used_spaces)):
-                if all(self.used_spaces[y]):
-                    # row is all filled:
-                    rows_cleared += 1
-
-                    # move everything down
-                    self.used_spaces[1 : y + 1] = self.used_spaces[0:y]
-                    for row in self.used_spaces[1 : y + 1]:
-                        for block in row:
-                            if block is not None:
-                                block.set_top_left(
-                                    Coordinate(
-                                        block.top_left.x, block.top_left.y + SPACE_SIZE
-                                    )
-                                )
-
-                    # clear the top row
-                    self.used_spaces[0] = numpy.array(
-                        [None] * PLAYER_GRID_DIMENSIONS[0]
-                    )
+            rows_cleared = self._clear_full_rows()
+            self._remove_rows_from_features(rows_cleared)
 
             # update score
             self.score_keeper.score += LINE_CLEAR_SCORES[rows_cleared]
@@ -134,12 +260,136 @@ class DroppedPieceGrid:
 
         return self
 
-    def draw(self):
-        assert self.render_mode == "human" or self.render_mode == "rgb-array"
+    def _add_spaces_to_features(self, spaces):
+        """
+        Updates the features for (y, x) spaces that were empty before.
+        The previous features are kept so the drop can be undone
+        """
+        self._saved_features = (
+            list(self._column_heights),
+            list(self._row_fills),
+            self._filled_spaces,
+            self._holes,
+            self._wells,
+            self._bumpiness,
+            self._board_hash,
+        )
+        grid_height = PLAYER_GRID_DIMENSIONS[1]
+        for y, x in spaces:
+            self._board_hash ^= CELL_KEYS[y][x]
+            self._row_fills[y] += 1
+            if self._column_heights[x] < grid_height - y:
+                self._column_heights[x] = grid_height - y
+        self._filled_spaces += len(spaces)
+        self._update_surface_features()
+
+    def _remove_rows_from_features(self, rows_cleared: int):
+        """
+        Updates the features after the full rows have been cleared
+        """
+        if not rows_cleared:
+            return
+        grid_width, grid_height = PLAYER_GRID_DIMENSIONS
+        self._row_fills = [0] * rows_cleared + [
+            fill for fill in self._row_fills if fill != grid_width
+        ]
+        self._filled_spaces -= rows_cleared * grid_width
+
+        # every cleared row was below the top of every column
+        for x, height in enumerate(self._column_heights):
+            height -= rows_cleared
+            # the top of the column may have been in a cleared row
+            while height and not self[Coordinate(x, grid_height - height)]:
+                height -= 1
+            self._column_heights[x] = height
+        self._board_hash = hash_rows(self.row_masks())
+        self._update_surface_features()
+
+    def _restore_features(self):
+        """
+        Puts back the features from before the last added piece
+        """
+        (
+            self._column_heights,
+            self._row_fills,
+            self._filled_spaces,
+            self._holes,
+            self._wells,
+            self._bumpiness,
+            self._board_hash,
+        ) = self._saved_features
+        self._saved_features = None
+
+    def _update_surface_features(self):
+        heights = self._column_heights
+        grid_width, grid_height = PLAYER_GRID_DIMENSIONS
+
+        self._holes = sum(heights) - self._filled_spaces
+        self._bumpiness = sum(
+            abs(heights[x] - heights[x + 1]) for x in range(grid_width - 1)
+        )
+        wells = 0
+        for x in range(grid_width):
+            left = heights[x - 1] if x > 0 else grid_height
+            right = heights[x + 1] if x < grid_width - 1 else grid_height
+            depth = min(left, right) - heights[x]
+            if depth > 0:
+                wells += depth
+        self._wells = wells
+
+    def _count_empty_spaces_beneath(self, piece: BasePiece) -> int:
+        """
+        Returns the number of empty spaces directly beneath the (already added) piece
+        """
+        empty_spaces_beneath = 0
+        coords = []
+        for block in piece.blocks:
+            coords.append(block.top_left)
+        used_x_coords = set()
+        for coord in coords:
+            if coord.x not in used_x_coords:
+                used_x_coords.add(coord.x)
+                x = coord.x
+                for y in range(coord.y, PLAYER_GRID_DIMENSIONS[1]):
+                    if self[Coordinate(x, y)]:
+                        if Coordinate(x, y) not in coords:
+                            break
+                    else:
+                        empty_spaces_beneath += 1
+        return empty_spaces_beneath
+
+    def _clear_full_rows(self) -> int:
+        """
+        Clears all the full rows, moving everything above them down.
+        Returns the number of rows cleared
+        """
+        rows_cleared = 0
+        for y in range(len(self.used_spaces)):
+            if all(self.used_spaces[y]):
+                # row is all filled:
+                rows_cleared += 1
+
+                # move everything down
+                self.used_spaces[1 : y + 1] = self.used_spaces[0:y]
+                for row in self.used_spaces[1 : y + 1]:
+                    for block in row:
+                        if block is not None:
+                            block.set_top_left(
+                                Coordinate(block.top_left.x, block.top_left.y + 1)
+                            )
+
+                # clear the top row
+                self.used_spaces[0] = numpy.array([None] * PLAYER_GRID_DIMENSIONS[0])
+        return rows_cleared
+
+    def placed_blocks(self):
+        """
+        Yields every block that has been dropped into the grid
+        """
         for row in self.used_spaces:
             for block in row:
                 if block is not None:
-                    block.draw()
+                    yield block
 
     @property
     def numeric_used_spaces(self):
@@ -148,35 +398,38 @@ class DroppedPieceGrid:
             ret.append(tuple([1 if row[x] is not None else 0 for x in range(len(row))]))
         return tuple(ret)
 
+    def row_masks(self) -> list:
+        """
+        Returns the grid as one bitmask per row,
+        where bit x is set when column x is used
+        """
+        return [
+            sum(1 << x for x in range(len(row)) if row[x] is not None)
+            for row in self.used_spaces
+        ]
+
     def _get_density(self):
-        min_x = min_y = float("inf")
-        max_x = max_y = 0
-        count = 0
-        for y in range(self.used_spaces.shape[0]):
-            for x in range(self.used_spaces.shape[1]):
-                if self.used_spaces[y, x]:
-                    min_x = min(min_x, x)
-                    max_x = max(max_x, x)
-                    min_y = min(min_y, y)
-                    max_y = max(max_y, y)
-                    count += 1
-        # print(
-        #    f"min x is {min_x} max x is {max_x} min y is {min_y} max y is {max_y} and count is {count}"
-        # )
-        density = count / ((max_y - min_y + 1) * (max_x - min_x + 1))
-        # print(f"and density is {density}")
-        return density
+        """
+        Returns the used spaces over the area of the box around them
+        """
+        if not self._filled_spaces:
+            return 0.0
+        used_rows = [y for y, fill in enumerate(self._row_fills) if fill]
+        used_columns = [x for x, height in enumerate(self._column_heights) if height]
+        box_height = used_rows[-1] - used_rows[0] + 1
+        box_width = used_columns[-1] - used_columns[0] + 1
+        return self._filled_spaces / (box_height * box_width)
 
     def _get_height(self):
         """
         Returns the height of the grid
         * Range is from 0 - 20
         """
-        height = 20
-        for y in range(len(self.used_spaces), 0, -1):
-            if all([cell is None for cell in self.used_spaces[y - 1]]):
-                height = 20 - y
+        height = 0
+        for fill in reversed(self._row_fills):
+            if not fill:
                 break
+            height += 1
         return height
 
     def _add_to_grid(self, piece: BasePiece) -> int:
@@ -187,19 +440,24 @@ class DroppedPieceGrid:
         max_height = 0
         if piece is not None:
             self.last_piece_spaces = []
+            new_spaces = []
 
-            max_height = (piece.blocks[0].top_left // SPACE_SIZE).y
+            max_height = piece.blocks[0].top_left.y
             for block in piece.blocks:
-                temp = block.top_left // SPACE_SIZE
+                temp = block.top_left
+                if self.used_spaces[temp.y, temp.x] is None:
+                    new_spaces.append((temp.y, temp.x))
                 self.used_spaces[temp.y, temp.x] = block
                 self.last_piece_spaces.append((temp.y, temp.x))
                 max_height = max(temp.y, max_height)
+            self._add_spaces_to_features(new_spaces)
         self.density = self._get_density()
         return max_height
 
     def _undo_last_drop(self):
         for space in self.last_piece_spaces:
             self.used_spaces[space] = None
+        self._restore_features()
 
     def simulate_drop(
         self, piece: BasePiece, cur_ul: Optional[Coordinate] = None
@@ -1,26 +1,93 @@
 from copy import copy, deepcopy
-import pygame
+import random
+from typing import Iterable, List, NamedTuple, Optional, Tuple
 from tetris.envs.game.constants import *
-from tetris.envs.game.dropped_piece_grid import DroppedPieceGrid
-from tetris.envs.game.line_grid import LineGrid
+from tetris.envs.game.bitboard import collides, piece_masks
+from tetris.envs.game.dropped_piece_grid import DroppedPieceGrid, GridState
+from tetris.envs.game.bitboard_grid import BitboardGrid
 from tetris.envs.game.piece import *
 from tetris.envs.game.score import Score
-from tetris.envs.game.next_pieces import NextPieces
+from tetris.envs.game.next_pieces import NextPieces, RANDOMIZERS
 from tetris.envs.game.holder import Holder
+from tetris.envs.game.metrics import Metrics, logger
+from tetris.envs.game.stats import StepStats
+from tetris.envs.game.placements import *
+from tetris.envs.game.afterstates import Afterstates, get_afterstates
+from tetris.envs.game.zobrist import hash_hold, hash_piece
+import numpy
+
+GRID_BACKENDS = {"object": DroppedPieceGrid, "bitboard": BitboardGrid}
+
+
+class GameSnapshot(NamedTuple):
+    """
+    Immutable copy of a game, made by TetrisGame.snapshot
+    """
+
+    grid: GridState
+    piece_type: type
+    rotation: int
+    top_left: Tuple[int, int]
+    piece_out: bool
+    held_piece: Optional[Tuple[type, int]]  # type and rotation
+    next_pieces: tuple
+    score: int
+    run: bool
+    holdable: bool
+    executions: int
+    just_dropped: bool
+    max_delta_h: int
+    valid_last_move: bool
 
 
 class TetrisGame:
-    def __init__(self, render_mode: Optional[str] = None):
+    def __init__(
+        self,
+        render_mode: Optional[str] = None,
+        grid_backend: str = "bitboard",
+        stats: bool = False,
+        metrics: Optional[Metrics] = None,
+        seed: Optional[int] = None,
+        randomizer: str = "uniform",
+        render_downsample: int = 1,
+    ):
         self.render_mode = render_mode
-        self.reset()
+        self.grid_backend = grid_backend
+
+        # every episode's pieces come from a seed of their own, drawn from rng
+        # once the game is seeded, and from the random module before that
+        assert randomizer in RANDOMIZERS
+        self.randomizer = randomizer
+        self.rng = None
+
+        # counters that used to be printed
+        self.metrics = metrics if metrics is not None else Metrics()
+
+        # per phase timings and event counts, see enable_stats
+        self.stats = None
+
+        # rendering is bolted on only when needed, so that
+        # headless games never import pygame.
+        # rgb arrays are drawn with NumPy, so they don't need a display either
+        self.renderer = None
+        if self.render_mode == "human":
+            from tetris.envs.game.renderer import TetrisRenderer
+
+            self.renderer = TetrisRenderer(self.render_mode)
+        elif self.render_mode == "rgb-array":
+            from tetris.envs.game.rasterizer import Rasterizer
+
+            self.renderer = Rasterizer(render_downsample)
+
+        self.reset(seed)
+        if stats:
+            self.enable_stats()
 
     def instantiate_piece(self, uninstantiated_piece) -> Piece:
         return uninstantiated_piece(
-            self.player_screen,
             BLOCK_START,
             self.dropped_piece_grid,
             self.score_keeper,
-            self.render_mode,
         )
 
     def get_next_piece(self):
@@ -31,13 +98,9 @@ class TetrisGame:
         self.holdable = True
         self.just_dropped = True
 
-    def hold_piece(self, events):
-        for event in events:
-            if (
-                event.type == pygame.KEYDOWN
-                and event.key in KEY_MAPPINGS
-                and KEY_MAPPINGS[event.key] == "hold"
-            ):
+    def hold_piece(self, actions: Iterable[int]):
+        for action in actions:
+            if action == ACTION_HOLD:
                 if self.holdable:
                     self.cur_piece = self.holder.swap(self.cur_piece)
                     if self.cur_piece is None:
@@ -46,24 +109,20 @@ class TetrisGame:
                 else:
                     self.valid_last_move = False
 
-    def reset(self):
+    def reset(
+        self, seed: Optional[int] = None, episode_seed: Optional[int] = None
+    ):
         """
         Resets tetris.
+        Seeding makes this and every later episode's pieces reproducible.
+        episode_seed sets this episode's pieces alone, like self.episode_seed
+        of an earlier episode.
         """
-        if self.render_mode == "human" or self.render_mode == "rgb-array":
-            pygame.init()
-            self.screen = pygame.display.set_mode(FULL_WINDOW_SIZE)
-            pygame.display.set_caption("tetris")
-            try:
-                pygame.display.set_icon(pygame.image.load("tetris/envs/game/logo.png"))
-            except Exception:
-                pass
-
-        # screens to draw on
-        self.player_screen = pygame.Surface(PLAYER_DIMENSIONS)
-        self.score_screen = pygame.Surface(SCORE_DIMENSIONS)
-        self.next_screen = pygame.Surface(NEXT_PIECES_DIMENSIONS)
-        self.holder_screen = pygame.Surface(HOLDER_DIMENSIONS)
+        if seed is not None:
+            self.rng = random.Random(seed)
+        if episode_seed is None:
+            episode_seed = (random if self.rng is None else self.rng).getrandbits(64)
+        self.episode_seed = episode_seed
 
         self.run = True
 
@@ -75,59 +134,178 @@ class TetrisGame:
         self.valid_last_move = True
 
         # variables used to run the game
-        self.score_keeper = Score(self.score_screen, self.render_mode)
-        self.dropped_piece_grid = DroppedPieceGrid(self.score_keeper, self.render_mode)
-        self.line_grid = LineGrid(self.player_screen, render_mode=self.render_mode)
-        self.next_pieces = NextPieces(self.next_screen, self.render_mode)
-        self.holder = Holder(self.holder_screen, self.render_mode)
+        self.score_keeper = Score()
+        self.dropped_piece_grid = GRID_BACKENDS[self.grid_backend](
+            self.score_keeper, self.render_mode
+        )
+        self.next_pieces = NextPieces(random.Random(episode_seed), self.randomizer)
+        self.holder = Holder()
         self.cur_piece = self.instantiate_piece(self.next_pieces.step())
 
-    def render(self):
-        assert self.render_mode == "human" or self.render_mode == "rgb-array"
-        self.screen.fill(BG_COLOR)
-        self.player_screen.fill(BG_COLOR)
+        # the action mask is only recomputed when its key changes
+        self._action_mask = None
+        self._action_mask_key = None
+
+        if self.stats is not None:
+            self._instrument_grid()
+
+    def snapshot(self) -> GameSnapshot:
+        """
+        Returns an immutable copy of the game that restore can go back to.
+        Nothing used for rendering is copied.
+        """
+        piece = self.cur_piece
+        held_piece = self.holder.held_piece
+        return GameSnapshot(
+            self.dropped_piece_grid.get_state(),
+            type(piece),
+            piece.rotation,
+            piece.top_left,
+            piece.out,
+            None if held_piece is None else (type(held_piece), held_piece.rotation),
+            self.next_pieces.get_state(),
+            self.score_keeper.score,
+            self.run,
+            self.holdable,
+            self.executions,
+            self.just_dropped,
+            self.max_delta_h,
+            self.valid_last_move,
+        )
 
-        # player draws
-        self.cur_piece.draw()
-        self.line_grid.draw()
-        self.dropped_piece_grid.draw()
+    def restore(self, snapshot: GameSnapshot):
+        """
+        Puts the game back to a snapshot. The same snapshot can be restored many times
+        """
+        self.dropped_piece_grid.set_state(snapshot.grid)
 
-        # score draws
-        self.score_keeper.draw()
+        # pieces of the right type are reused rather than rebuilt
+        piece = self.cur_piece
+        if type(piece) is not snapshot.piece_type:
+            piece = self.cur_piece = self.instantiate_piece(snapshot.piece_type)
+        piece.rotation = snapshot.rotation
+        piece.set_top_left(snapshot.top_left)
+        piece._out = snapshot.piece_out
 
-        # next pieces draws
-        self.next_pieces.draw()
+        # the held piece is moved back to the start when it is swapped out,
+        # so only its type and rotation matter
+        if snapshot.held_piece is None:
+            self.holder.held_piece = None
+        else:
+            held_type, held_rotation = snapshot.held_piece
+            if type(self.holder.held_piece) is not held_type:
+                self.holder.held_piece = self.instantiate_piece(held_type)
+            self.holder.held_piece.rotation = held_rotation
 
-        # holder draws
-        self.holder.draw()
+        self.next_pieces.set_state(snapshot.next_pieces)
+        self.score_keeper.score = snapshot.score
+        self.run = snapshot.run
+        self.holdable = snapshot.holdable
+        self.executions = snapshot.executions
+        self.just_dropped = snapshot.just_dropped
+        self.max_delta_h = snapshot.max_delta_h
+        self.valid_last_move = snapshot.valid_last_move
 
-        # draw the individual screens
-        self.screen.blit(self.score_screen, SCORE_SCREEN_POS)
-        self.screen.blit(self.player_screen, PLAYER_SCREEN_POS)
-        self.screen.blit(self.next_screen, NEXT_PIECES_SCREEN_POS)
-        self.screen.blit(self.holder_screen, HOLDER_SCREEN_POS)
+    def enable_stats(self) -> StepStats:
+        """
+        Starts recording the time and calls of each phase of a step
+        (hold, move, gravity, lock, line_clear and the whole step)
+        and counts of game events in self.stats.
+        This swaps in timed versions of the methods involved,
+        so games that never call it run exactly as before.
+        """
+        if self.stats is not None:
+            return self.stats
+        stats = self.stats = StepStats()
 
-        pygame.display.update()
-        if self.render_mode == "rgb-array":
-            return pygame.surfarray.array3d(self.screen)
+        step = stats.timed("step", self.step)
+        hold_piece = stats.timed("hold", self.hold_piece)
+        get_next_piece = stats.timed("lock", self.get_next_piece)
+        instantiate_piece = self.instantiate_piece
 
-    def step(self, events: Optional[pygame.event.Event] = None):
-        if events is None:
-            actual_events = pygame.event.get()
+        def step_with_events(
+            actions: Optional[Iterable[int]] = None, legal: Optional[bool] = None
+        ):
+            was_running = self.run
+            holdable = self.holdable
+            step(actions, legal)
+            stats.count("ticks")
+            if holdable and actions and ACTION_HOLD in actions:
+                stats.count("holds")
+            if not self.valid_last_move:
+                stats.count("invalid_moves")
+            if was_running and not self.run:
+                stats.count("game_overs")
 
-            # if there's a quit
-            for event in actual_events:
-                if event.type == pygame.QUIT:
-                    self.run = False
-        else:
-            actual_events = events
+        def get_next_piece_with_events():
+            # holding with nothing held also gets the next piece
+            if self.cur_piece is not None:
+                stats.count("pieces_locked")
+            get_next_piece()
+
+        def instantiate_timed_piece(uninstantiated_piece) -> Piece:
+            return self._instrument_piece(instantiate_piece(uninstantiated_piece))
+
+        self.step = step_with_events
+        self.hold_piece = hold_piece
+        self.get_next_piece = get_next_piece_with_events
+        self.instantiate_piece = instantiate_timed_piece
+
+        self._instrument_piece(self.cur_piece)
+        if self.holder.held_piece is not None:
+            self._instrument_piece(self.holder.held_piece)
+        self._instrument_grid()
+        return stats
+
+    def _instrument_piece(self, piece: Piece) -> Piece:
+        piece.move = self.stats.timed("move", piece.move)
+        piece.move_down = self.stats.timed("gravity", piece.move_down)
+        return piece
+
+    def _instrument_grid(self):
+        stats = self.stats
+        clear_full_rows = stats.timed(
+            "line_clear", self.dropped_piece_grid._clear_full_rows
+        )
+
+        def clear_full_rows_with_events() -> int:
+            rows_cleared = clear_full_rows()
+            if rows_cleared:
+                stats.count("line_clears")
+                stats.count("lines_cleared", rows_cleared)
+            return rows_cleared
+
+        self.dropped_piece_grid._clear_full_rows = clear_full_rows_with_events
+
+    def render(self):
+        assert self.render_mode == "human" or self.render_mode == "rgb-array"
+        return self.renderer.render(self)
+
+    def close(self):
+        self.run = False
+        if self.renderer is not None:
+            self.renderer.close()
+
+    def step(
+        self, actions: Optional[Iterable[int]] = None, legal: Optional[bool] = None
+    ):
+        """
+        Advances the game by one tick.
+        actions are action codes; if none are given, they are read
+        from the keyboard when rendering and the tick is idle otherwise.
+        legal overrides whether the moves count as legal, for callers that
+        know better than a single tick can, like macro actions.
+        """
+        if actions is None:
+            if self.renderer is not None:
+                actions = self.renderer.get_actions(self)
+            else:
+                actions = ()
 
         self.valid_last_move = True
         self.just_dropped = False
-        self.hold_piece(actual_events)
-        self.valid_last_move = (
-            self.cur_piece.move(actual_events) and self.valid_last_move
-        )
+        self.hold_piece(actions)
+        self.valid_last_move = self.cur_piece.move(actions) and self.valid_last_move
         self.executions += 1
 
         if self.cur_piece.out:
@@ -140,30 +318,177 @@ class TetrisGame:
                 self.get_next_piece()
                 self.executions = STEPS_BETWEEN_DOWNS // 2
 
+        if legal is not None:
+            self.valid_last_move = legal
         if not self.valid_last_move:
-            print("invalid move")
+            self.metrics.increment("invalid_moves")
+            logger.debug("invalid move")
+
+    def fast_forward(self, ticks: int) -> int:
+        """
+        Advances the game by up to ticks idle ticks, ending in the same state as
+        calling step with no actions that many times, but without stepping through
+        the ticks where gravity only counts down. Stops after the piece locks.
+        Returns the number of ticks advanced.
+        """
+        if ticks <= 0:
+            return 0
+        piece = self.cur_piece
+        if self.stats is not None:
+            # every tick is stepped so that it is timed and counted
+            for tick in range(1, ticks + 1):
+                self.step(())
+                if self.cur_piece is not piece or not self.run:
+                    return tick
+            return ticks
 
-    def is_move_valid(self, event):
-        if event.type != pygame.KEYDOWN:
+        self.valid_last_move = True
+        self.just_dropped = False
+        # ticks up to and including the next one with gravity
+        until_gravity = STEPS_BETWEEN_DOWNS - self.executions
+        if not self.run or ticks < until_gravity:
+            self.executions += ticks
+            return ticks
+
+        # how far the piece can fall, found on the row bitmasks in one go
+        x, y = piece.top_left
+        landing = drop_placement(
+            self.dropped_piece_grid.row_masks(), type(piece), piece.rotation, x, y
+        )
+        if landing is None:
+            # the piece overlaps the grid, so it locks on the next gravity tick
+            fall = 0
+        else:
+            fall = landing.y - y
+
+        gravity_ticks = 1 + (ticks - until_gravity) // STEPS_BETWEEN_DOWNS
+        if gravity_ticks <= fall:
+            piece.set_top_left(Coordinate(x, y + gravity_ticks))
+            self.executions = (ticks - until_gravity) % STEPS_BETWEEN_DOWNS
+            return ticks
+
+        # the piece falls all the way, and the tick after its last fall locks it
+        if fall:
+            piece.set_top_left(Coordinate(x, y + fall))
+        self.executions = STEPS_BETWEEN_DOWNS - 1
+        self.step(())
+        return until_gravity + fall * STEPS_BETWEEN_DOWNS
+
+    def is_move_valid(self, action: int):
+        if action not in ACTION_NAMES:
             return False
+        return bool(self.get_action_mask()[action])
 
-        # hold a piece
-        if event.key == pygame.K_c:
-            return self.holdable
+    def get_action_mask(self) -> numpy.ndarray:
+        """
+        Returns a read-only bool array with whether each action would do something.
+        All actions are checked in one pass against the grid's row bitmasks,
+        and the array is reused until the piece, the grid or holdability changes.
+        """
+        piece = self.cur_piece
+        grid = self.dropped_piece_grid
+        key = (
+            piece,
+            piece.rotation,
+            piece.top_left.x,
+            piece.top_left.y,
+            grid,
+            grid.version,
+            self.holdable,
+        )
+        if key == self._action_mask_key:
+            return self._action_mask
 
-        # do nothing
-        elif event.key == pygame.K_q:
-            return True
+        rows = grid.row_masks()
+        x, y = piece.top_left
+        state = piece.rotation_state
+        masks = piece_masks(state.arrangement)
 
-        # move/rotate
-        else:
-            clone = self.cur_piece.clone()
-            return clone.move([event])
+        mask = numpy.zeros(NUM_ACTIONS, dtype=bool)
+        mask[ACTION_LEFT] = not collides(rows, masks, x - 1, y)
+        mask[ACTION_RIGHT] = not collides(rows, masks, x + 1, y)
+        mask[ACTION_SOFT_DROP] = mask[ACTION_HARD_DROP] = not collides(
+            rows, masks, x, y + 1
+        )
+        if state.rotate_center is not None:
+            for action, new_rotation, shift in (
+                (ACTION_SPIN_RIGHT, (piece.rotation + 1) % 4, state.right_shift),
+                (ACTION_SPIN_LEFT, (piece.rotation - 1) % 4, state.left_shift),
+            ):
+                mask[action] = not collides(
+                    rows,
+                    piece_masks(piece.rotations[new_rotation].arrangement),
+                    x + shift[0],
+                    y + shift[1],
+                )
+        mask[ACTION_HOLD] = self.holdable
+        mask[ACTION_NOTHING] = True
+        mask.flags.writeable = False
+
+        self._action_mask = mask
+        self._action_mask_key = key
+        return mask
+
+    def get_placements(self, piece_type: Optional[type] = None) -> List[Placement]:
+        """
+        Returns every distinct place the current piece can come to rest in from
+        where it is now. If piece_type is given, returns the places a piece of
+        that type could rest in from the spawn position instead.
+        """
+        rows = self.dropped_piece_grid.row_masks()
+        if piece_type is None:
+            return get_placements(
+                rows, type(self.cur_piece), piece_placement(self.cur_piece)
+            )
+        return get_placements(rows, piece_type)
+
+    def get_afterstates(
+        self, include_hold: bool = True, dtype=numpy.float32
+    ) -> Afterstates:
+        """
+        Returns the afterstates of every distinct place the current piece can be
+        locked in from where it is now, and with include_hold, if it can hold,
+        of the piece that holding brings into play locked anywhere from the spawn
+        position. The grid itself isn't changed.
+        """
+        piece = self.cur_piece
+        candidates = [
+            (False, type(piece), placement) for placement in self.get_placements()
+        ]
+        if include_hold and self.holdable:
+            held_piece = self.holder.held_piece
+            if held_piece is not None:
+                hold_type = type(held_piece)
+                start = Placement(held_piece.rotation, START_X, START_Y)
+            else:
+                hold_type = self.next_pieces.next_pieces[0]
+                start = None
+            rows = self.dropped_piece_grid.row_masks()
+            candidates += [
+                (True, hold_type, placement)
+                for placement in get_placements(rows, hold_type, start)
+            ]
+        return get_afterstates(self.dropped_piece_grid.row_masks(), candidates, dtype)
+
+    @property
+    def state_hash(self) -> int:
+        """
+        Zobrist hash of the board, the piece in play and what is held
+        """
+        piece = self.cur_piece
+        held_piece = self.holder.held_piece
+        return (
+            self.dropped_piece_grid.board_hash
+            ^ hash_piece(type(piece), piece.rotation, *piece.top_left)
+            ^ hash_hold(
+                type(held_piece) if held_piece is not None else None, self.holdable
+            )
+        )
 
     def play_execution_based(self):
         self.step()
         self.render()
-        pygame.time.wait(50)
+        self.renderer.wait(50)
 
     @property
     def total_lines_cleared(self):
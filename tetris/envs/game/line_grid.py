@@ -8,16 +8,11 @@ class LineGrid:
         self,
         screen: pygame.Surface,
         color: Optional[tuple] = WHITE,
-        render_mode: Optional[str] = None,
     ):
         self.screen = screen
         self.color = color
-        self.render_mode = render_mode
-        if self.render_mode == "human":
-            pygame.init()
 
     def draw(self):
-        assert self.render_mode == "human" or self.render_mode == "rgb-array"
         # vertical lines
         for i in range(1, PLAYER_GRID_DIMENSIONS[0]):
             pygame.draw.line(
@@ -0,0 +1,44 @@
+import logging
+from collections import defaultdict
+from typing import Optional
+
+logger = logging.getLogger("tetris")
+
+
+class Metrics:
+    """
+    In-memory counters and configuration of a game, kept instead of printing.
+    Counters add up until they are flushed, and one Metrics can be shared
+    by many games.
+    """
+
+    def __init__(self):
+        self.counters = defaultdict(int)
+        self.config = {}
+
+    def increment(self, name: str, amount: int = 1):
+        self.counters[name] += amount
+
+    def get(self, name: str) -> int:
+        return self.counters.get(name, 0)
+
+    def set_config(self, **config):
+        self.config.update(config)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "config: %s", ", ".join(f"{k}={v}" for k, v in config.items())
+            )
+
+    def as_dict(self) -> dict:
+        return {"counters": dict(self.counters), "config": dict(self.config)}
+
+    def flush(self, log_level: Optional[int] = None) -> dict:
+        """
+        Returns the counters and config, logging them at log_level if one is given,
+        and starts the counters from zero again
+        """
+        ret = self.as_dict()
+        if log_level is not None:
+            logger.log(log_level, "metrics: %s", ret)
+        self.counters.clear()
+        return ret
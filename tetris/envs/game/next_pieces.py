@@ -1,43 +1,94 @@
 from typing import Optional
-import pygame
 from tetris.envs.game.constants import *
 from tetris.envs.game.piece import *
 import random
 
+PIECE_OPTIONS = (LPiece, JPiece, IPiece, SPiece, ZPiece, TPiece, OPiece)
+RANDOMIZERS = ("uniform", "bag")
+
+# pieces generated at a time
+CHUNK_SIZE = 7 * 64
+
+
+def generate_sequence(rng: random.Random, count: int, randomizer: str) -> bytes:
+    """
+    Returns at least count pieces as indices into PIECE_OPTIONS, one byte each.
+    uniform picks every piece independently, bag deals out shuffled
+    bags of all 7 pieces (so bag sequences are whole bags long).
+    """
+    num_pieces = len(PIECE_OPTIONS)
+    if randomizer == "uniform":
+        return bytes(rng.choices(range(num_pieces), k=count))
+    elif randomizer == "bag":
+        sequence = bytearray()
+        bag = list(range(num_pieces))
+        while len(sequence) < count:
+            rng.shuffle(bag)
+            sequence.extend(bag)
+        return bytes(sequence)
+    raise ValueError(f"unknown randomizer {randomizer}, expected one of {RANDOMIZERS}")
+
 
 class NextPieces:
     """
     Class for representing the next pieces
-    Auto clears the screen, so no need to do clear the screen
     """
 
     def __init__(
-        self, screen: pygame.Surface, render_mode: Optional[str] = None
+        self, rng: Optional[random.Random] = None, randomizer: str = "uniform"
     ) -> None:
-        self.screen = screen
-        self.piece_options = (LPiece, JPiece, IPiece, SPiece, ZPiece, TPiece, OPiece)
-        self.next_pieces = [random.choice(self.piece_options) for i in range(3)]
-        self.render_mode = render_mode
-        if self.render_mode == "human" or self.render_mode == "rgb-array":
-            pygame.init()
-            pygame.font.init()
-            self.font = pygame.font.SysFont("Comic Sans", TEXT_SIZE)
+        self.piece_options = PIECE_OPTIONS
+        self.randomizer = randomizer
+
+        # without a generator of its own, a seed is drawn from the random module
+        if rng is None:
+            rng = random.Random(random.getrandbits(64))
+        self.rng = rng
+        # the state of rng, saved the first time it is needed after each chunk
+        self._rng_state = None
+
+        self.sequence = b""
+        self.position = 0
+        self.next_pieces = [self._draw() for i in range(3)]
 
     def step(self) -> Piece:
         ret = self.next_pieces.pop(0)
-        self.next_pieces.append(random.choice(self.piece_options))
+        self.next_pieces.append(self._draw())
         return ret
 
-    def draw(self):
-        assert self.render_mode == "human" or self.render_mode == "rgb-array"
-        self.screen.fill(BLACK)
-        self.screen.blit(self.font.render("Next:", True, TEXT_COLOR), (0, 0))
-        for piece, idx in zip(self.next_pieces, [i for i in range(3)]):
-            piece(
-                self.screen,
-                (
-                    SPACE_SIZE,
-                    NEXT_PIECES_LABEL_DIMENSIONS[1] + (3 * idx + 1) * SPACE_SIZE,
-                ),
-                render_mode=self.render_mode,
-            ).draw()
+    def pregenerate(self, count: int) -> bytes:
+        """
+        Makes sure at least count pieces after the next pieces are generated,
+        and returns them as indices into PIECE_OPTIONS
+        """
+        missing = count - (len(self.sequence) - self.position)
+        if missing > 0:
+            self.sequence = self.sequence[self.position :] + generate_sequence(
+                self.rng, missing, self.randomizer
+            )
+            self.position = 0
+            self._rng_state = None
+        return self.sequence[self.position : self.position + count]
+
+    def get_state(self) -> tuple:
+        """
+        Returns the queue and where the generator is up to.
+        Generated pieces are immutable, so this is cheap.
+        """
+        if self._rng_state is None:
+            self._rng_state = self.rng.getstate()
+        return tuple(self.next_pieces), self.sequence, self.position, self._rng_state
+
+    def set_state(self, state: tuple):
+        next_pieces, self.sequence, self.position, rng_state = state
+        self.next_pieces = list(next_pieces)
+        if rng_state is not self._rng_state:
+            self.rng.setstate(rng_state)
+            self._rng_state = rng_state
+
+    def _draw(self) -> type:
+        if self.position >= len(self.sequence):
+            self.pregenerate(CHUNK_SIZE)
+        ret = self.piece_options[self.sequence[self.position]]
+        self.position += 1
+        return ret
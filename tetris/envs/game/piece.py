@@ -1,5 +1,4 @@
-import pygame
-from typing import Optional, Union, Tuple
+from typing import Iterable, NamedTuple, Optional, Tuple
 from tetris.envs.game.base_piece import BasePiece
 from tetris.envs.game.coordinate import Coordinate
 from tetris.envs.game.dropped_piece_grid import DroppedPieceGrid
@@ -7,225 +6,245 @@ from tetris.envs.game.constants import *
 from tetris.envs.game.score import Score
 
 
+class RotationState(NamedTuple):
+    """
+    One rotation of a piece. Shifts and offsets are in spaces, not pixels
+    """
+
+    arrangement: Tuple[Tuple[int, int], ...]
+    rotate_center: Optional[Tuple[int, int]]
+    width: int
+    height: int
+    offset: Tuple[int, int]  # top left relative to the spawn rotation's top left
+    right_shift: Tuple[int, int]  # top left translation when spinning right
+    left_shift: Tuple[int, int]  # top left translation when spinning left
+
+
+def _spin(arrangement, rotate_center, clockwise: bool):
+    """
+    Spins an arrangement around its rotate center.
+    Returns the new arrangement, the new rotate center and the translation
+    of the top left, all relative to the new top left.
+    """
+    cx, cy = rotate_center
+    if clockwise:
+        spun = [(-(y - cy), x - cx) for x, y in arrangement]
+    else:
+        spun = [(y - cy, -(x - cx)) for x, y in arrangement]
+
+    # the location of the top left, relative to the rotate center
+    min_x = min(coord[0] for coord in spun)
+    min_y = min(coord[1] for coord in spun)
+
+    # shift the arrangement to be back to being relative to the top left
+    new_arrangement = tuple((x - min_x, y - min_y) for x, y in spun)
+    return new_arrangement, (-min_x, -min_y), (cx + min_x, cy + min_y)
+
+
+def build_rotations(arrangement, rotate_center) -> Tuple[RotationState, ...]:
+    """
+    Precomputes the 4 rotations of a piece, starting from the given arrangement.
+    Pieces without a rotate center have 4 identical rotations.
+    """
+    arrangement = tuple(tuple(coord) for coord in arrangement)
+    rotate_center = tuple(rotate_center) if rotate_center is not None else None
+
+    states = []
+    offset = (0, 0)
+    for r in range(4):
+        if rotate_center is None:
+            right_shift = left_shift = (0, 0)
+            next_arrangement, next_center = arrangement, rotate_center
+        else:
+            next_arrangement, next_center, right_shift = _spin(
+                arrangement, rotate_center, True
+            )
+            left_shift = _spin(arrangement, rotate_center, False)[2]
+        states.append(
+            RotationState(
+                arrangement,
+                rotate_center,
+                max(coord[0] for coord in arrangement) + 1,
+                max(coord[1] for coord in arrangement) + 1,
+                offset,
+                right_shift,
+                left_shift,
+            )
+        )
+        arrangement, rotate_center = next_arrangement, next_center
+        offset = (offset[0] + right_shift[0], offset[1] + right_shift[1])
+    return tuple(states)
+
+
 class Piece(BasePiece):
+    # precomputed rotations, filled in for every piece type when it is defined
+    ROTATIONS: Tuple[RotationState, ...] = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "SPAWN_ARRANGEMENT" in cls.__dict__:
+            cls.ROTATIONS = build_rotations(
+                cls.SPAWN_ARRANGEMENT, cls.SPAWN_ROTATE_CENTER
+            )
+
     def __init__(
         self,
-        screen: pygame.Surface,
         arrangement: tuple,
         color: tuple,
         top_left: tuple,
         dropped_piece_grid: Optional[DroppedPieceGrid] = None,
         rotate_center: tuple = None,
         score_keeper: Optional[Score] = None,
-        render_mode: Optional[str] = None,
     ):
-        super().__init__(screen, arrangement, color, top_left, render_mode)
+        self.rotations = self.ROTATIONS or build_rotations(arrangement, rotate_center)
+        self.rotation = 0
+        super().__init__(arrangement, color, top_left)
         self._out = False
         self.dropped_piece_grid = dropped_piece_grid
         self.score_keeper = score_keeper
-        self.rotate_center = rotate_center
 
     @property
     def out(self):
         return self._out
 
+    @property
+    def rotation_state(self) -> RotationState:
+        return self.rotations[self.rotation]
+
+    @property
+    def arrangement(self) -> Tuple[Tuple[int, int], ...]:
+        return self.rotations[self.rotation].arrangement
+
+    @arrangement.setter
+    def arrangement(self, arrangement):
+        arrangement = tuple(tuple(coord) for coord in arrangement)
+        for r, state in enumerate(self.rotations):
+            if state.arrangement == arrangement:
+                self.rotation = r
+                return
+        raise ValueError(f"{arrangement} is not a rotation of {type(self).__name__}")
+
+    @property
+    def rotate_center(self) -> Optional[Tuple[int, int]]:
+        return self.rotations[self.rotation].rotate_center
+
     def _rotate(
-        self, cur_top_left: Coordinate, new_arrangement: Tuple[list], check_valid=True
+        self, cur_top_left: Coordinate, new_rotation: int, shift, check_valid=True
     ) -> Coordinate:
         """
-        Helper method that does the calculating and modifying of self.arrangement and self.rotate_center
-        @Pre - self.rotate_center is not None
+        Helper method that switches to the given rotation, if it fits.
+        Returns the top left to use with the new rotation
         """
-        assert (
-            self.rotate_center is not None
-        ), "Can't rotate around nothing!!! Please provide a rotate_center"
-
-        # get the absolute coordinate of the rotate center
-        center_coord = Coordinate(
-            cur_top_left.x + self.rotate_center[0] * SPACE_SIZE,
-            cur_top_left.y + self.rotate_center[1] * SPACE_SIZE,
-        )
-
-        # the location of the top left, relative to the rotate center
-        relative_top_left = min([coord[0] for coord in new_arrangement]), min(
-            [coord[1] for coord in new_arrangement]
-        )
-
-        # get the new absolute top left
-        new_top_left = Coordinate(
-            center_coord.x + relative_top_left[0] * SPACE_SIZE,
-            center_coord.y + relative_top_left[1] * SPACE_SIZE,
-        )
-
-        # the new rotate center, relative to the new top left
-        new_center = -relative_top_left[0], -relative_top_left[1]
-
-        # shift the arrangement to be back to being
-        # relative to the top left
-        for coord in new_arrangement:
-            coord[0] -= relative_top_left[0]
-            coord[1] -= relative_top_left[1]
-
-        if check_valid:
-            # try the rotate
-            self.arrangement, actual_top_left, self.rotate_center = self._try_rotate(
-                new_arrangement, cur_top_left, new_top_left, new_center
-            )
-        else:
-            # assume that it is valid (because check_valid is False)
-            self.arrangement, actual_top_left, self.rotate_center = (
-                new_arrangement,
-                new_top_left,
-                new_center,
-            )
-
-        return actual_top_left
+        new_top_left = Coordinate(cur_top_left.x + shift[0], cur_top_left.y + shift[1])
+        if check_valid and self.dropped_piece_grid.contains_piece(
+            self,
+            top_left=new_top_left,
+            arrangement=self.rotations[new_rotation].arrangement,
+        ):
+            return cur_top_left
+        self.rotation = new_rotation
+        return new_top_left
 
-    def rotate_left(self, cur_top_left: Coordinate) -> Coordinate:
+    def rotate_left(self, cur_top_left: Coordinate, check_valid=True) -> Coordinate:
         """
-        Modifies self.arrangement and self.rotate_center. DOES NOT modify self.top_left
+        Modifies self.rotation. DOES NOT modify self.top_left
         Instead, returns a coordinate that can be used as the new top left.
         """
         if self.rotate_center is not None:
-            new_arrangement = []
-            for coord in self.arrangement:
-                new_arrangement.append(
-                    [
-                        coord[1] - self.rotate_center[1],
-                        -(coord[0] - self.rotate_center[0]),
-                    ]
-                )
-
-            return self._rotate(cur_top_left, new_arrangement)
+            return self._rotate(
+                cur_top_left,
+                (self.rotation - 1) % 4,
+                self.rotations[self.rotation].left_shift,
+                check_valid,
+            )
 
         return cur_top_left
 
     def rotate_right(self, cur_top_left: Coordinate, check_valid=True) -> Coordinate:
         """
-        Modifies self.arrangement and self.rotate_center. DOES NOT modify self.top_left
+        Modifies self.rotation. DOES NOT modify self.top_left
         Instead, returns a coordinate that can be used as the new top left.
         """
         if self.rotate_center is not None:
-            new_arrangement = []
-            for coord in self.arrangement:
-                new_arrangement.append(
-                    [
-                        -(coord[1] - self.rotate_center[1]),
-                        coord[0] - self.rotate_center[0],
-                    ]
-                )
-            return self._rotate(cur_top_left, new_arrangement, check_valid)
+            return self._rotate(
+                cur_top_left,
+                (self.rotation + 1) % 4,
+                self.rotations[self.rotation].right_shift,
+                check_valid,
+            )
 
         return cur_top_left
 
-    def _try_move(
-        self,
-        cur_top_left: Coordinate,
-        coord_to_add: Coordinate,
-        moved_coord: Optional[Coordinate] = Coordinate(),
-    ) -> Coordinate:
+    def _try_move(self, cur_top_left: Coordinate, dx: int, dy: int) -> Coordinate:
         """
         Attempts to do the move given. If it succeeds, the returned coordinate will reflect
         the move. If not, then the returned coordinate will be the same as the original.
-        If a moved_coord is provided, then that will be modified to reflect the delta pos
         """
-        temp = cur_top_left + coord_to_add
+        temp = Coordinate(cur_top_left.x + dx, cur_top_left.y + dy)
         if not self.dropped_piece_grid.contains_piece(self, top_left=temp):
-            moved_coord += coord_to_add
             return temp
         return cur_top_left
 
-    def _try_hard_drop(
-        self, cur_top_left: Coordinate, moved_coord: Optional[Coordinate] = Coordinate()
-    ) -> Coordinate:
+    def _try_hard_drop(self, cur_top_left: Coordinate) -> Coordinate:
         """
         Attempts to hard drop the piece. If it succeeds, the returned coordinate will reflect
         the move. If not, then the returned coordinate will be the same as the original.
-        If a moved_coord is provided, then that will be modified to reflect the delta pos
         """
         past = cur_top_left
-        cur = cur_top_left
-        cur = self._try_move(cur, Coordinate(0, SPACE_SIZE), moved_coord)
+        cur = self._try_move(cur_top_left, 0, 1)
         while cur != past:
             past = cur
-            cur = self._try_move(cur, Coordinate(0, SPACE_SIZE), moved_coord)
+            cur = self._try_move(cur, 0, 1)
         return cur
 
-    def _try_rotate(
-        self,
-        arrangement: Union[list, tuple],
-        old_top_left: Coordinate,
-        new_top_left: Coordinate,
-        new_center: tuple,
-    ) -> Tuple[list, Coordinate]:
-        """
-        Attempts to do use the given arrangement.
-        If it succeeds, it will return the arrangement and the new top left
-        Else, it will return the old top left and the piece's original arrangement
-        """
-        if not self.dropped_piece_grid.contains_piece(
-            self, top_left=new_top_left, arrangement=arrangement
-        ):
-            return arrangement, new_top_left, new_center
-        return self.arrangement, old_top_left, self.rotate_center
-
     def move(
         self,
-        keyInputs: Optional[Tuple[pygame.event.Event]] = None,
+        actions: Optional[Iterable[int]] = None,
     ) -> bool:
         # valid move variables
         valid_move = True
-        prev_arrangement = self.arrangement
-        prev_rotate_center = self.rotate_center
+        prev_rotation = self.rotation
         had_valid_key = False
         valid_key_affects = True
 
         next_coordinate = self.top_left
 
-        if keyInputs is not None:
-            for event in keyInputs:
-                if (event.type == pygame.KEYDOWN) and event.key in KEY_MAPPINGS:
+        if actions is not None:
+            for action in actions:
+                if action in ACTION_NAMES:
                     had_valid_key = True
 
-                    if (
-                        KEY_MAPPINGS[event.key] == "nothing"
-                        or KEY_MAPPINGS[event.key] == "hold"
-                    ):
+                    if action == ACTION_NOTHING or action == ACTION_HOLD:
                         valid_key_affects = False
-                    if KEY_MAPPINGS[event.key] == "right":
-                        next_coordinate = self._try_move(
-                            next_coordinate, Coordinate(SPACE_SIZE, 0)
-                        )
-                    if KEY_MAPPINGS[event.key] == "left":
-                        next_coordinate = self._try_move(
-                            next_coordinate, Coordinate(-SPACE_SIZE, 0)
-                        )
-                    if KEY_MAPPINGS[event.key] == "soft drop":
-                        next_coordinate = self._try_move(
-                            next_coordinate, Coordinate(0, SPACE_SIZE)
-                        )
+                    if action == ACTION_RIGHT:
+                        next_coordinate = self._try_move(next_coordinate, 1, 0)
+                    if action == ACTION_LEFT:
+                        next_coordinate = self._try_move(next_coordinate, -1, 0)
+                    if action == ACTION_SOFT_DROP:
+                        next_coordinate = self._try_move(next_coordinate, 0, 1)
                         # this should increase score by 1
                         if self.score_keeper is not None:
                             self.score_keeper.score += 1
-                    if KEY_MAPPINGS[event.key] == "hard drop":
-                        temp = Coordinate()
-                        next_coordinate = self._try_hard_drop(next_coordinate, temp)
+                    if action == ACTION_HARD_DROP:
+                        dropped_from = next_coordinate
+                        next_coordinate = self._try_hard_drop(next_coordinate)
 
                         if self.score_keeper is not None:
                             # this should increase score by 2 * spaces_dropped
-                            self.score_keeper.score += 2 * (temp // SPACE_SIZE).y
+                            self.score_keeper.score += 2 * (
+                                next_coordinate.y - dropped_from.y
+                            )
                         self._out = True
 
-                    if KEY_MAPPINGS[event.key] == "spin right":
+                    if action == ACTION_SPIN_RIGHT:
                         next_coordinate = self.rotate_right(next_coordinate)
-                    if KEY_MAPPINGS[event.key] == "spin left":
+                    if action == ACTION_SPIN_LEFT:
                         next_coordinate = self.rotate_left(next_coordinate)
 
         if (
             (had_valid_key and valid_key_affects)
             and next_coordinate == self.top_left
-            and prev_arrangement == self.arrangement
-            and prev_rotate_center == self.rotate_center
+            and prev_rotation == self.rotation
         ):
             # if absolutely nothing changed
             # and it had valid keys,
@@ -237,15 +256,17 @@ class Piece(BasePiece):
 
     def move_down(self) -> bool:
         old_top_left = self.top_left
-        next_coordinate = self._try_move(self.top_left, Coordinate(0, SPACE_SIZE))
-        self.top_left = next_coordinate
-        return old_top_left != self.top_left
+        next_coordinate = self._try_move(self.top_left, 0, 1)
+        if next_coordinate != old_top_left:
+            self.set_top_left(next_coordinate)
+            return True
+        return False
 
     def get_height(self) -> int:
         """
         Returns height IN SQUARES, NOT PIXELS
         """
-        return max([lst[1] for lst in self.arrangement])
+        return self.rotations[self.rotation].height - 1
 
     def _get_best_ul(self) -> Tuple[Coordinate, int]:
         """
@@ -259,18 +280,18 @@ class Piece(BasePiece):
 
         for x in range(PLAYER_GRID_DIMENSIONS[0]):
             for y in range(PLAYER_GRID_DIMENSIONS[1]):
-                cur_ul = Coordinate(x, y) * SPACE_SIZE
+                cur_ul = Coordinate(x, y)
 
                 if self.dropped_piece_grid.contains_piece(self, top_left=cur_ul):
                     continue
                 if not self.dropped_piece_grid.contains_piece(
-                    self, top_left=Coordinate(cur_ul.x, cur_ul.y + SPACE_SIZE)
+                    self, top_left=Coordinate(x, y + 1)
                 ):
                     continue
 
                 board_delta_h = self.dropped_piece_grid.simulate_drop(self, cur_ul)
 
-                piece_delta_h = cur_ul.y // SPACE_SIZE + self.get_height()
+                piece_delta_h = y + self.get_height()
 
                 if (
                     board_delta_h < min_board_delta_h
@@ -314,195 +335,156 @@ class Piece(BasePiece):
 
         return best_ul, best_arrangement
 
+    def clone(self):
+        ret = type(self)(self.top_left, self.dropped_piece_grid, None)
+        ret.rotation = self.rotation
+        ret._get_blocks()
+        return ret
+
+
 
 class OPiece(Piece):
+    SPAWN_ARRANGEMENT = ((0, 0), (0, 1), (1, 0), (1, 1))
+    SPAWN_ROTATE_CENTER = None
+    COLOR = YELLOW
+
     def __init__(
         self,
-        screen: pygame.Surface,
         top_left: tuple,
         dropped_piece_grid: Optional[DroppedPieceGrid] = None,
         score_keeper: Optional[Score] = None,
-        render_mode: Optional[str] = None,
     ):
         super().__init__(
-            screen,
-            ((0, 0), (0, 1), (1, 0), (1, 1)),
-            YELLOW,
+            self.SPAWN_ARRANGEMENT,
+            self.COLOR,
             top_left,
             dropped_piece_grid,
-            score_keeper=score_keeper,
-            render_mode=render_mode,
+            self.SPAWN_ROTATE_CENTER,
+            score_keeper,
         )
 
-    def clone(self):
-        ret = OPiece(self.screen, self.top_left, self.dropped_piece_grid, None, None)
-        ret._get_blocks()
-        return ret
-
 
 class ZPiece(Piece):
+    SPAWN_ARRANGEMENT = ((1, 0), (0, 1), (1, 1), (2, 0))
+    SPAWN_ROTATE_CENTER = (1, 1)
+    COLOR = RED
+
     def __init__(
         self,
-        screen: pygame.Surface,
         top_left: tuple,
         dropped_piece_grid: Optional[DroppedPieceGrid] = None,
         score_keeper: Optional[Score] = None,
-        render_mode: Optional[str] = None,
     ):
         super().__init__(
-            screen,
-            ((1, 0), (0, 1), (1, 1), (2, 0)),
-            RED,
+            self.SPAWN_ARRANGEMENT,
+            self.COLOR,
             top_left,
             dropped_piece_grid,
-            (1, 1),
+            self.SPAWN_ROTATE_CENTER,
             score_keeper,
-            render_mode,
         )
 
-    def clone(self):
-        ret = ZPiece(self.screen, self.top_left, self.dropped_piece_grid, None, None)
-        ret.arrangement = self.arrangement.copy()
-        ret.rotate_center = self.rotate_center
-        ret._get_blocks()
-        return ret
-
 
 class SPiece(Piece):
+    SPAWN_ARRANGEMENT = ((0, 0), (1, 0), (1, 1), (2, 1))
+    SPAWN_ROTATE_CENTER = (1, 1)
+    COLOR = GREEN
+
     def __init__(
         self,
-        screen: pygame.Surface,
         top_left: tuple,
         dropped_piece_grid: Optional[DroppedPieceGrid] = None,
         score_keeper: Optional[Score] = None,
-        render_mode: Optional[str] = None,
     ):
         super().__init__(
-            screen,
-            ((0, 0), (1, 0), (1, 1), (2, 1)),
-            GREEN,
+            self.SPAWN_ARRANGEMENT,
+            self.COLOR,
             top_left,
             dropped_piece_grid,
-            (1, 1),
+            self.SPAWN_ROTATE_CENTER,
             score_keeper,
-            render_mode,
         )
 
-    def clone(self):
-        ret = SPiece(self.screen, self.top_left, self.dropped_piece_grid, None, None)
-        ret.arrangement = self.arrangement.copy()
-        ret.rotate_center = self.rotate_center
-        ret._get_blocks()
-        return ret
-
 
 class JPiece(Piece):
+    SPAWN_ARRANGEMENT = ((0, 0), (0, 1), (1, 1), (2, 1))
+    SPAWN_ROTATE_CENTER = (1, 1)
+    COLOR = DARK_BLUE
+
     def __init__(
         self,
-        screen: pygame.Surface,
         top_left: tuple,
         dropped_piece_grid: Optional[DroppedPieceGrid] = None,
         score_keeper: Optional[Score] = None,
-        render_mode: Optional[str] = None,
     ):
         super().__init__(
-            screen,
-            ((0, 0), (0, 1), (1, 1), (2, 1)),
-            DARK_BLUE,
+            self.SPAWN_ARRANGEMENT,
+            self.COLOR,
             top_left,
             dropped_piece_grid,
-            (1, 1),
+            self.SPAWN_ROTATE_CENTER,
             score_keeper,
-            render_mode,
         )
 
-    def clone(self):
-        ret = JPiece(self.screen, self.top_left, self.dropped_piece_grid, None, None)
-        ret.arrangement = self.arrangement.copy()
-        ret.rotate_center = self.rotate_center
-        ret._get_blocks()
-        return ret
-
 
 class LPiece(Piece):
+    SPAWN_ARRANGEMENT = ((0, 0), (0, 1), (1, 0), (2, 0))
+    SPAWN_ROTATE_CENTER = (1, 0)
+    COLOR = ORANGE
+
     def __init__(
         self,
-        screen: pygame.Surface,
         top_left: tuple,
         dropped_piece_grid: Optional[DroppedPieceGrid] = None,
         score_keeper: Optional[Score] = None,
-        render_mode: Optional[str] = None,
     ):
         super().__init__(
-            screen,
-            ((0, 0), (0, 1), (1, 0), (2, 0)),
-            ORANGE,
+            self.SPAWN_ARRANGEMENT,
+            self.COLOR,
             top_left,
             dropped_piece_grid,
-            (1, 0),
+            self.SPAWN_ROTATE_CENTER,
             score_keeper,
-            render_mode,
         )
 
-    def clone(self):
-        ret = LPiece(self.screen, self.top_left, self.dropped_piece_grid, None, None)
-        ret.arrangement = self.arrangement.copy()
-        ret.rotate_center = self.rotate_center
-        ret._get_blocks()
-        return ret
-
 
 class IPiece(Piece):
+    SPAWN_ARRANGEMENT = ((0, 0), (1, 0), (2, 0), (3, 0))
+    SPAWN_ROTATE_CENTER = (1, 0)
+    COLOR = LIGHT_BLUE
+
     def __init__(
         self,
-        screen: pygame.Surface,
         top_left: tuple,
         dropped_piece_grid: Optional[DroppedPieceGrid] = None,
         score_keeper: Optional[Score] = None,
-        render_mode: Optional[str] = None,
     ):
         super().__init__(
-            screen,
-            ((0, 0), (1, 0), (2, 0), (3, 0)),
-            LIGHT_BLUE,
+            self.SPAWN_ARRANGEMENT,
+            self.COLOR,
             top_left,
             dropped_piece_grid,
-            (1, 0),
+            self.SPAWN_ROTATE_CENTER,
             score_keeper,
-            render_mode,
         )
 
-    def clone(self):
-        ret = IPiece(self.screen, self.top_left, self.dropped_piece_grid, None, None)
-        ret.arrangement = self.arrangement.copy()
-        ret.rotate_center = self.rotate_center
-        ret._get_blocks()
-        return ret
-
 
 class TPiece(Piece):
+    SPAWN_ARRANGEMENT = ((0, 0), (1, 0), (1, 1), (2, 0))
+    SPAWN_ROTATE_CENTER = (1, 0)
+    COLOR = PURPLE
+
     def __init__(
         self,
-        screen: pygame.Surface,
         top_left: tuple,
         dropped_piece_grid: Optional[DroppedPieceGrid] = None,
         score_keeper: Optional[Score] = None,
-        render_mode: Optional[str] = None,
     ):
         super().__init__(
-            screen,
-            ((0, 0), (1, 0), (1, 1), (2, 0)),
-            PURPLE,
+            self.SPAWN_ARRANGEMENT,
+            self.COLOR,
             top_left,
             dropped_piece_grid,
-            (1, 0),
+            self.SPAWN_ROTATE_CENTER,
             score_keeper,
-            render_mode,
         )
-
-    def clone(self):
-        ret = TPiece(self.screen, self.top_left, self.dropped_piece_grid, None, None)
-        ret.arrangement = self.arrangement.copy()
-        ret.rotate_center = self.rotate_center
-        ret._get_blocks()
-        return ret
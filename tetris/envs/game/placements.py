@@ -0,0 +1,287 @@
+from functools import partial
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+from tetris.envs.game.constants import *
+from tetris.envs.game.bitboard import FULL_ROW, GRID_HEIGHT, GRID_WIDTH, piece_masks
+from tetris.envs.game.base_piece import BasePiece
+
+START_X, START_Y = BLOCK_START
+
+
+class Placement(NamedTuple):
+    """
+    Where a piece comes to rest. x and y are the top left, in spaces
+    """
+
+    rotation: int
+    x: int
+    y: int
+
+
+# states are packed into ints while searching: rotation, x + _X_PAD, y
+_X_PAD = 8
+_shifted_masks_cache = {}
+
+
+def _pack(rotation: int, x: int, y: int) -> int:
+    return ((rotation << 5) | (x + _X_PAD)) << 5 | y
+
+
+def _unpack(state: int) -> Placement:
+    return Placement(state >> 10, ((state >> 5) & 31) - _X_PAD, state & 31)
+
+
+def _shifted_masks(piece_type: type):
+    """
+    Returns, for every rotation and x + _X_PAD, the height and row masks of the piece
+    shifted to x, or None if the piece would stick out of the sides of the grid
+    """
+    shifted = _shifted_masks_cache.get(piece_type)
+    if shifted is None:
+        shifted = []
+        for state in piece_type.ROTATIONS:
+            width, height, row_masks = piece_masks(state.arrangement)
+            shifted.append(
+                [
+                    (height, tuple((dy, mask << x) for dy, mask in row_masks))
+                    if 0 <= x and x + width <= GRID_WIDTH
+                    else None
+                    for x in range(-_X_PAD, GRID_WIDTH + _X_PAD)
+                ]
+            )
+        _shifted_masks_cache[piece_type] = shifted
+    return shifted
+
+
+def _fits(rows: Sequence[int], shifted: list, rotation: int, x: int, y: int) -> bool:
+    """
+    Returns whether a piece with the shifted masks of _shifted_masks fits on rows
+    in rotation with its top left at (x, y)
+    """
+    if y < 0 or not -_X_PAD <= x < GRID_WIDTH + _X_PAD:
+        return False
+    masks = shifted[rotation][x + _X_PAD]
+    if masks is None or y + masks[0] > GRID_HEIGHT:
+        return False
+    for dy, mask in masks[1]:
+        if rows[y + dy] & mask:
+            return False
+    return True
+
+
+def _search(
+    rows: Sequence[int], piece_type: type, start: Placement
+) -> Tuple[List[int], Dict[int, Tuple[int, int]]]:
+    """
+    Breadth first search over (rotation, x, y) using the game's moves.
+    Gravity is not simulated, so every move is assumed to fit in before the piece falls.
+    Returns the reachable resting states and how each state was first reached,
+    with states packed by _pack.
+    """
+    rotations = piece_type.ROTATIONS
+    can_spin = piece_type.SPAWN_ROTATE_CENTER is not None
+    fits = partial(_fits, rows, _shifted_masks(piece_type))
+
+    resting = []
+    start_state = _pack(*start)
+    parents = {start_state: None}
+    if not fits(*start):
+        return resting, parents
+
+    queue = [start_state]
+    for state in queue:
+        rotation, x, y = _unpack(state)
+        moves = [
+            (ACTION_LEFT, rotation, x - 1, y),
+            (ACTION_RIGHT, rotation, x + 1, y),
+        ]
+        if can_spin:
+            right_shift = rotations[rotation].right_shift
+            left_shift = rotations[rotation].left_shift
+            moves.append(
+                (
+                    ACTION_SPIN_RIGHT,
+                    (rotation + 1) % 4,
+                    x + right_shift[0],
+                    y + right_shift[1],
+                )
+            )
+            moves.append(
+                (
+                    ACTION_SPIN_LEFT,
+                    (rotation - 1) % 4,
+                    x + left_shift[0],
+                    y + left_shift[1],
+                )
+            )
+        if fits(rotation, x, y + 1):
+            moves.append((ACTION_SOFT_DROP, rotation, x, y + 1))
+        else:
+            resting.append(state)
+
+        for action, next_rotation, next_x, next_y in moves:
+            if action == ACTION_SOFT_DROP or fits(next_rotation, next_x, next_y):
+                next_state = _pack(next_rotation, next_x, next_y)
+                if next_state not in parents:
+                    parents[next_state] = (state, action)
+                    queue.append(next_state)
+    return resting, parents
+
+
+def _cells_key(piece_type: type, placement: Placement) -> tuple:
+    """
+    Returns a key that is equal for placements covering the same spaces
+    """
+    rotation, x, y = placement
+    return tuple(
+        (y + dy, mask << x)
+        for dy, mask in piece_masks(piece_type.ROTATIONS[rotation].arrangement)[2]
+    )
+
+
+def get_placements(
+    rows: Sequence[int], piece_type: type, start: Optional[Placement] = None
+) -> List[Placement]:
+    """
+    Returns every distinct place a piece can come to rest in,
+    starting from start (the spawn position by default).
+    rows is the grid as one bitmask per row, like DroppedPieceGrid.row_masks().
+    Rotations that cover the same spaces are only returned once.
+    """
+    if start is None:
+        start = Placement(0, START_X, START_Y)
+    resting, _ = _search(rows, piece_type, start)
+
+    placements = []
+    seen = set()
+    for placement in sorted(map(_unpack, resting)):
+        key = _cells_key(piece_type, placement)
+        if key not in seen:
+            seen.add(key)
+            placements.append(placement)
+    return placements
+
+
+def get_path(
+    rows: Sequence[int],
+    piece_type: type,
+    placement: Placement,
+    start: Optional[Placement] = None,
+) -> Optional[List[int]]:
+    """
+    Returns the actions that take a piece from start (the spawn position by default)
+    to the given placement, ending with a hard drop when the last moves are drops.
+    Returns None if the placement can't be reached.
+    """
+    if start is None:
+        start = Placement(0, START_X, START_Y)
+    _, parents = _search(rows, piece_type, start)
+
+    state = _pack(*placement)
+    if state not in parents:
+        # a different rotation covering the same spaces may be reachable
+        key = _cells_key(piece_type, placement)
+        for other in parents:
+            if _cells_key(piece_type, _unpack(other)) == key:
+                state = other
+                break
+        else:
+            return None
+
+    actions = []
+    while parents[state] is not None:
+        state, action = parents[state]
+        actions.append(action)
+    actions.reverse()
+
+    if actions and actions[-1] == ACTION_SOFT_DROP:
+        while actions and actions[-1] == ACTION_SOFT_DROP:
+            actions.pop()
+        actions.append(ACTION_HARD_DROP)
+    return actions
+
+
+def drop_placement(
+    rows: Sequence[int], piece_type: type, rotation: int, x: int, y: int = START_Y
+) -> Optional[Placement]:
+    """
+    Returns where a piece in rotation with its top left in column x comes to rest
+    when dropped straight down from row y, or None if it doesn't fit there
+    """
+    shifted = _shifted_masks(piece_type)
+    if not _fits(rows, shifted, rotation, x, y):
+        return None
+    while _fits(rows, shifted, rotation, x, y + 1):
+        y += 1
+    return Placement(rotation, x, y)
+
+
+def get_drop_path(
+    rows: Sequence[int],
+    piece_type: type,
+    rotation: int,
+    x: int,
+    start: Optional[Placement] = None,
+) -> Optional[Tuple[List[int], Placement]]:
+    """
+    Returns the actions that spin a piece from start (the spawn position by default)
+    to rotation, shift it to column x and hard drop it, and where it comes to rest.
+    Returns None if any of the moves is blocked.
+    Unlike get_path, nothing is searched, so this is cheap enough for every tick.
+    """
+    if start is None:
+        start = Placement(0, START_X, START_Y)
+    cur_rotation, cur_x, cur_y = start
+    shifted = _shifted_masks(piece_type)
+    if not _fits(rows, shifted, cur_rotation, cur_x, cur_y):
+        return None
+
+    actions = []
+    turns = (rotation - cur_rotation) % 4
+    if turns:
+        if piece_type.SPAWN_ROTATE_CENTER is None:
+            return None
+        # three spins right are one spin left
+        spin_right = turns < 3
+        for i in range(turns if spin_right else 1):
+            state = piece_type.ROTATIONS[cur_rotation]
+            shift = state.right_shift if spin_right else state.left_shift
+            cur_rotation = (cur_rotation + (1 if spin_right else -1)) % 4
+            cur_x += shift[0]
+            cur_y += shift[1]
+            if not _fits(rows, shifted, cur_rotation, cur_x, cur_y):
+                return None
+            actions.append(ACTION_SPIN_RIGHT if spin_right else ACTION_SPIN_LEFT)
+
+    step = 1 if x > cur_x else -1
+    while cur_x != x:
+        cur_x += step
+        if not _fits(rows, shifted, cur_rotation, cur_x, cur_y):
+            return None
+        actions.append(ACTION_RIGHT if step == 1 else ACTION_LEFT)
+
+    actions.append(ACTION_HARD_DROP)
+    return actions, drop_placement(rows, piece_type, cur_rotation, cur_x, cur_y)
+
+
+def place(
+    rows: Sequence[int], piece_type: type, placement: Placement
+) -> Tuple[Tuple[int, ...], int]:
+    """
+    Returns the rows after locking the piece at placement and clearing
+    the full rows, and the number of rows cleared
+    """
+    rotation, x, y = placement
+    new_rows = list(rows)
+    for dy, mask in piece_masks(piece_type.ROTATIONS[rotation].arrangement)[2]:
+        new_rows[y + dy] |= mask << x
+
+    kept = [row for row in new_rows if row != FULL_ROW]
+    rows_cleared = len(new_rows) - len(kept)
+    return (0,) * rows_cleared + tuple(kept), rows_cleared
+
+
+def piece_placement(piece: BasePiece) -> Placement:
+    """
+    Returns the current rotation and position of a piece as a Placement
+    """
+    return Placement(piece.rotation, piece.top_left.x, piece.top_left.y)
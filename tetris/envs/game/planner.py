@@ -0,0 +1,257 @@
+import time
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+from tetris.envs.game.constants import *
+from tetris.envs.game.bitboard import POPCOUNT, collides, piece_masks
+from tetris.envs.game.placements import *
+from tetris.envs.game.zobrist import TranspositionTable, hash_rows, hash_spaces
+
+# scores a board after some placements: (rows, lines cleared on the way) -> value
+Evaluation = Callable[[Tuple[int, ...], int], float]
+
+
+class BoardFeatures(NamedTuple):
+    column_heights: Tuple[int, ...]
+    holes: int
+    bumpiness: int
+    wells: int
+
+
+def board_features(rows: Sequence[int]) -> BoardFeatures:
+    """
+    Returns the features of a board given as one bitmask per row
+    """
+    heights = [0] * GRID_WIDTH
+    holes = 0
+    seen = 0
+    for y, row in enumerate(rows):
+        new = row & ~seen
+        while new:
+            bit = new & -new
+            heights[bit.bit_length() - 1] = GRID_HEIGHT - y
+            new ^= bit
+        # empty spaces below the top of their column
+        holes += POPCOUNT[seen & ~row]
+        seen |= row
+
+    bumpiness = 0
+    wells = 0
+    for x in range(GRID_WIDTH):
+        if x < GRID_WIDTH - 1:
+            bumpiness += abs(heights[x] - heights[x + 1])
+        left = heights[x - 1] if x > 0 else GRID_HEIGHT
+        right = heights[x + 1] if x < GRID_WIDTH - 1 else GRID_HEIGHT
+        depth = min(left, right) - heights[x]
+        if depth > 0:
+            wells += depth
+    return BoardFeatures(tuple(heights), holes, bumpiness, wells)
+
+
+def default_evaluation(rows: Tuple[int, ...], lines_cleared: int) -> float:
+    """
+    Linear evaluation with weights tuned for placement based play
+    """
+    features = board_features(rows)
+    return (
+        -0.510066 * sum(features.column_heights)
+        + 0.760666 * lines_cleared
+        - 0.35663 * features.holes
+        - 0.184483 * features.bumpiness
+    )
+
+
+class Plan(NamedTuple):
+    """
+    The first move of the best line of play found
+    """
+
+    hold: bool  # whether to hold before placing
+    placement: Placement
+    value: float
+    nodes: int  # placements evaluated to find it
+
+
+class _Node(NamedTuple):
+    value: float
+    rows: Tuple[int, ...]
+    board_hash: int
+    held: Optional[type]
+    next_idx: int  # index of the next piece to play in the sequence
+    lines: int
+    first: Tuple[bool, Placement]
+
+
+class BeamSearchPlanner:
+    """
+    Beam search over piece placements using the current piece, the held piece
+    and the next pieces preview. Every depth places one piece, either the one
+    in play or the held one, and keeps the best beam_width boards.
+    The search stops early when the node or time budget runs out.
+    Placements and evaluations are cached in a transposition table by board hash,
+    which can be shared between planners.
+    """
+
+    def __init__(
+        self,
+        evaluate: Optional[Evaluation] = None,
+        beam_width: int = 8,
+        max_depth: Optional[int] = None,
+        node_budget: Optional[int] = None,
+        time_budget: Optional[float] = None,
+        transposition_table: Optional[TranspositionTable] = None,
+    ):
+        self.evaluate = evaluate if evaluate is not None else default_evaluation
+        self.beam_width = beam_width
+        self.max_depth = max_depth
+        self.node_budget = node_budget
+        self.time_budget = time_budget  # in seconds
+        if transposition_table is None:
+            transposition_table = TranspositionTable()
+        self.transposition_table = transposition_table
+
+        # the move being carried out by next_action
+        self._target = None
+
+    def plan(self, game) -> Optional[Plan]:
+        """
+        Returns the best first move for the game, or None if no piece can be placed
+        """
+        start_time = time.perf_counter()
+        piece = game.cur_piece
+        held_piece = game.holder.held_piece
+        sequence = [type(piece)] + list(game.next_pieces.next_pieces)
+        rows = tuple(game.dropped_piece_grid.row_masks())
+
+        # the first placements start from where the pieces are now
+        root_starts = {False: piece_placement(piece)}
+        if held_piece is not None:
+            root_starts[True] = Placement(held_piece.rotation, START_X, START_Y)
+
+        held_type = type(held_piece) if held_piece is not None else None
+        beam = [_Node(0.0, rows, hash_rows(rows), held_type, 0, 0, None)]
+        nodes = 0
+        depth = 0
+        out_of_budget = False
+        while not out_of_budget and (self.max_depth is None or depth < self.max_depth):
+            children = {}
+            for node in beam:
+                can_hold = game.holdable if depth == 0 else True
+                for hold, piece_type, held, next_idx in self._piece_options(
+                    node, sequence, can_hold
+                ):
+                    start = root_starts.get(hold) if depth == 0 else None
+                    for placement in self._get_placements(node, piece_type, start):
+                        new_rows, rows_cleared = place(node.rows, piece_type, placement)
+                        if rows_cleared:
+                            board_hash = hash_rows(new_rows)
+                        else:
+                            board_hash = node.board_hash ^ hash_spaces(
+                                piece_type, *placement
+                            )
+                        key = (board_hash, held, next_idx)
+                        lines = node.lines + rows_cleared
+                        value = self._value(
+                            new_rows, board_hash, lines, sequence, next_idx
+                        )
+                        nodes += 1
+                        if key not in children or children[key].value < value:
+                            first = node.first or (hold, placement)
+                            children[key] = _Node(
+                                value,
+                                new_rows,
+                                board_hash,
+                                held,
+                                next_idx,
+                                lines,
+                                first,
+                            )
+                if self._out_of_budget(nodes, start_time):
+                    out_of_budget = True
+                    break
+
+            if not children:
+                break
+            beam = sorted(children.values(), key=lambda node: -node.value)
+            beam = beam[: self.beam_width]
+            depth += 1
+
+        if beam[0].first is None:
+            return None
+        hold, placement = beam[0].first
+        return Plan(hold, placement, beam[0].value, nodes)
+
+    def next_action(self, game) -> int:
+        """
+        Returns the next action towards the planned placement of the current piece,
+        planning again whenever the piece changes or the placement can't be reached
+        """
+        piece = game.cur_piece
+        rows = game.dropped_piece_grid.row_masks()
+        if self._target is not None and self._target[0] is piece:
+            path = get_path(rows, type(piece), self._target[1], piece_placement(piece))
+            if path:
+                return path[0]
+
+        plan = self.plan(game)
+        if plan is None:
+            return ACTION_HARD_DROP
+        if plan.hold:
+            self._target = None
+            return ACTION_HOLD
+        self._target = (piece, plan.placement)
+        path = get_path(rows, type(piece), plan.placement, piece_placement(piece))
+        return path[0] if path else ACTION_HARD_DROP
+
+    def _piece_options(self, node: _Node, sequence: List[type], can_hold: bool):
+        """
+        Yields (whether it holds, piece type to place, held piece after, next index)
+        """
+        idx = node.next_idx
+        if idx >= len(sequence):
+            return
+        yield False, sequence[idx], node.held, idx + 1
+        if can_hold:
+            if node.held is not None:
+                yield True, node.held, sequence[idx], idx + 1
+            elif idx + 1 < len(sequence):
+                yield True, sequence[idx + 1], sequence[idx], idx + 2
+
+    def _get_placements(
+        self, node: _Node, piece_type: type, start: Optional[Placement]
+    ) -> List[Placement]:
+        key = ("placements", node.board_hash, piece_type, start)
+        placements = self.transposition_table.get(key)
+        if placements is None:
+            placements = get_placements(node.rows, piece_type, start)
+            self.transposition_table.put(key, placements)
+        return placements
+
+    def _value(
+        self,
+        rows: Tuple[int, ...],
+        board_hash: int,
+        lines: int,
+        sequence: List[type],
+        next_idx: int,
+    ) -> float:
+        # losing is worse than any board
+        if next_idx < len(sequence):
+            masks = piece_masks(sequence[next_idx].ROTATIONS[0].arrangement)
+            if collides(rows, masks, START_X, START_Y):
+                return float("-inf")
+
+        key = ("value", board_hash, lines, self.evaluate)
+        value = self.transposition_table.get(key)
+        if value is None:
+            value = self.evaluate(rows, lines)
+            self.transposition_table.put(key, value)
+        return value
+
+    def _out_of_budget(self, nodes: int, start_time: float) -> bool:
+        if self.node_budget is not None and nodes >= self.node_budget:
+            return True
+        if (
+            self.time_budget is not None
+            and time.perf_counter() - start_time >= self.time_budget
+        ):
+            return True
+        return False
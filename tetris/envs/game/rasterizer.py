@@ -0,0 +1,196 @@
+from typing import List, Tuple
+import numpy
+from tetris.envs.game.constants import *
+from tetris.envs.game.next_pieces import PIECE_OPTIONS
+
+# every color that can be drawn. Pixels are drawn as indices into this
+_COLORS = tuple(dict.fromkeys([BG_COLOR, WHITE] + [p.COLOR for p in PIECE_OPTIONS]))
+_PALETTE = numpy.array(_COLORS, dtype=numpy.uint8)
+_COLOR_IDS = {color: idx for idx, color in enumerate(_COLORS)}
+
+# the first slots of a frame are always the background and the grid lines
+_BG_SLOT = 0
+_LINE_SLOT = 1
+
+
+def _cell_offsets(length: int, num_cells: int, stride: int) -> numpy.ndarray:
+    """
+    For every pixel along one side of a box of spaces, the space it is in
+    times stride, or -1 between spaces
+    """
+    pixels = numpy.arange(length)
+    cells = numpy.minimum(pixels // SPACE_SIZE, num_cells - 1)
+    return numpy.where(pixels % SPACE_SIZE < BLOCK_SIZE, cells * stride, -1)
+
+
+class Rasterizer:
+    """
+    Draws a TetrisGame straight into a uint8 array, without pygame or a display.
+    The frame has the same (width, height, 3) layout as the human window
+    read with pygame.surfarray, minus the text.
+
+    Every pixel belongs to a slot, either the background, a grid line or
+    one space of the board, hold box or next pieces. The background and lines are
+    drawn once. Drawing a frame gives each space a color, and only the blocks of
+    spaces that changed color since the last frame are stamped into it.
+    With downsample, only every downsample-th pixel in each direction is drawn.
+    """
+
+    def __init__(self, downsample: int = 1) -> None:
+        assert downsample >= 1
+        self.render_mode = "rgb-array"
+        self.downsample = downsample
+
+        grid_width, grid_height = PLAYER_GRID_DIMENSIONS
+        self._board_slot = 2
+        self._holder_slot = self._board_slot + grid_width * grid_height
+        self._next_slot = (
+            self._holder_slot + HOLDER_GRID_DIMENSIONS[0] * HOLDER_GRID_DIMENSIONS[1]
+        )
+        num_slots = (
+            self._next_slot
+            + NEXT_PIECES_GRID_DIMENSIONS[0] * NEXT_PIECES_GRID_DIMENSIONS[1]
+        )
+        self._slots = numpy.zeros(num_slots, dtype=numpy.intp)
+        self._slots[_LINE_SLOT] = _COLOR_IDS[WHITE]
+        # the pixels of the block of every space, as slices of the frame
+        self._block_slices = [None] * num_slots
+
+        full_map = numpy.full(FULL_WINDOW_SIZE, _BG_SLOT, dtype=numpy.intp)
+        self._add_box(
+            full_map,
+            PLAYER_SCREEN_POS,
+            PLAYER_DIMENSIONS,
+            PLAYER_GRID_DIMENSIONS,
+            self._board_slot,
+            _LINE_SLOT,
+        )
+        self._add_box(
+            full_map,
+            (HOLDER_SCREEN_POS[0], HOLDER_SCREEN_POS[1] + HOLDER_LABEL_DIMENSIONS[1]),
+            HOLDER_BOX_DIMENSIONS,
+            HOLDER_GRID_DIMENSIONS,
+            self._holder_slot,
+            _BG_SLOT,
+        )
+        self._add_box(
+            full_map,
+            (
+                NEXT_PIECES_SCREEN_POS[0],
+                NEXT_PIECES_SCREEN_POS[1] + NEXT_PIECES_LABEL_DIMENSIONS[1],
+            ),
+            NEXT_PIECES_BOX_DIMENSIONS,
+            NEXT_PIECES_GRID_DIMENSIONS,
+            self._next_slot,
+            _BG_SLOT,
+        )
+        self.frame = numpy.take(
+            _PALETTE[self._slots], full_map[::downsample, ::downsample], axis=0
+        )
+        # the color of every slot as it is in the frame
+        self._drawn = self._slots.copy()
+
+    def _add_box(
+        self,
+        full_map: numpy.ndarray,
+        screen_pos: Tuple[int, int],
+        dimensions: Tuple[int, int],
+        grid_dimensions: Tuple[int, int],
+        first_slot: int,
+        gap_slot: int,
+    ):
+        """
+        Gives the pixels of a box of spaces their slots, row by row from first_slot,
+        and the pixels between spaces gap_slot
+        """
+        d = self.downsample
+        for cy in range(grid_dimensions[1]):
+            top = screen_pos[1] + cy * SPACE_SIZE
+            rows = slice(-(-top // d), -(-(top + BLOCK_SIZE) // d))
+            for cx in range(grid_dimensions[0]):
+                left = screen_pos[0] + cx * SPACE_SIZE
+                columns = slice(-(-left // d), -(-(left + BLOCK_SIZE) // d))
+                self._block_slices[first_slot + cy * grid_dimensions[0] + cx] = (
+                    columns,
+                    rows,
+                )
+
+        x_offsets = _cell_offsets(dimensions[0], grid_dimensions[0], 1)[:, None]
+        y_offsets = _cell_offsets(
+            dimensions[1], grid_dimensions[1], grid_dimensions[0]
+        )[None, :]
+        x, y = screen_pos
+        full_map[x : x + dimensions[0], y : y + dimensions[1]] = numpy.where(
+            (x_offsets >= 0) & (y_offsets >= 0),
+            first_slot + x_offsets + y_offsets,
+            gap_slot,
+        )
+
+    def render(self, game) -> numpy.ndarray:
+        """
+        Draws game and returns the frame, which is overwritten by the next render
+        """
+        slots = self._slots
+        slots[self._board_slot :] = _COLOR_IDS[BG_COLOR]
+
+        # the current piece is drawn under the placed blocks, like on screen
+        grid_width, grid_height = PLAYER_GRID_DIMENSIONS
+        color = _COLOR_IDS[game.cur_piece.color]
+        for block in game.cur_piece.blocks:
+            x, y = block.top_left
+            if 0 <= x < grid_width and 0 <= y < grid_height:
+                slots[self._board_slot + y * grid_width + x] = color
+        for block in game.dropped_piece_grid.placed_blocks():
+            x, y = block.top_left
+            slots[self._board_slot + y * grid_width + x] = _COLOR_IDS[block.color]
+
+        # pieces outside the board are drawn one space in from the top left
+        held_piece = game.holder.held_piece
+        if held_piece is not None:
+            self._draw_arrangement(
+                self._holder_slot,
+                HOLDER_GRID_DIMENSIONS[0],
+                (1, 1),
+                held_piece.color,
+                held_piece.arrangement,
+            )
+        for idx, piece in enumerate(game.next_pieces.next_pieces):
+            self._draw_arrangement(
+                self._next_slot,
+                NEXT_PIECES_GRID_DIMENSIONS[0],
+                (1, 3 * idx + 1),
+                piece.COLOR,
+                piece.ROTATIONS[0].arrangement,
+            )
+
+        frame = self.frame
+        for slot in numpy.flatnonzero(slots != self._drawn).tolist():
+            frame[self._block_slices[slot]] = _PALETTE[slots[slot]]
+        self._drawn[:] = slots
+        return frame
+
+    def _draw_arrangement(
+        self,
+        first_slot: int,
+        grid_width: int,
+        top_left: Tuple[int, int],
+        color: tuple,
+        arrangement: List[Tuple[int, int]],
+    ):
+        color = _COLOR_IDS[color]
+        for coord in arrangement:
+            x = top_left[0] + coord[0]
+            y = top_left[1] + coord[1]
+            self._slots[first_slot + y * grid_width + x] = color
+
+    def get_actions(self, game) -> List[int]:
+        """
+        There is no keyboard to read without a display
+        """
+        return []
+
+    def wait(self, milliseconds: int):
+        pass
+
+    def close(self):
+        pass
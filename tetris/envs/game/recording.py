@@ -0,0 +1,275 @@
+import struct
+import zlib
+from array import array
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+from tetris.envs.game.game import TetrisGame
+from tetris.envs.game.next_pieces import RANDOMIZERS
+
+# an episode file is a sequence of records, each one a header followed by
+# an episode. Records are only ever appended, so one file can be shared by every
+# game of a worker. A record cut short by a crash only loses that episode:
+# readers stop before it, and writers cut it off before appending.
+
+MAGIC = b"TREC"
+FORMAT_VERSION = 1
+
+# magic, format version, length of the rest of the record
+_HEADER = struct.Struct("<4sBI")
+# seed, randomizer, checksum interval, number of actions, score, final state hash
+_EPISODE = struct.Struct("<QBHIdQ")
+
+# actions between checksums
+CHECKSUM_INTERVAL = 64
+
+
+class ReplayError(ValueError):
+    """
+    Raised when a replay doesn't reach the recorded state
+    """
+
+
+class Episode(NamedTuple):
+    """
+    Everything needed to play an episode again: the seed of its pieces
+    and its actions, with state hashes to check the replay against
+    """
+
+    seed: int
+    randomizer: str
+    actions: bytes
+    # state hash after every checksum_interval actions
+    checksums: Tuple[int, ...]
+    checksum_interval: int
+    score: float
+    final_hash: int
+
+
+def encode_episode(episode: Episode) -> bytes:
+    body = (
+        _EPISODE.pack(
+            episode.seed,
+            RANDOMIZERS.index(episode.randomizer),
+            episode.checksum_interval,
+            len(episode.actions),
+            episode.score,
+            episode.final_hash,
+        )
+        + array("Q", episode.checksums).tobytes()
+        + zlib.compress(episode.actions)
+    )
+    return _HEADER.pack(MAGIC, FORMAT_VERSION, len(body)) + body
+
+
+def decode_episode(body: bytes) -> Episode:
+    """
+    Decodes the part of a record after its header
+    """
+    (
+        seed,
+        randomizer,
+        checksum_interval,
+        num_actions,
+        score,
+        final_hash,
+    ) = _EPISODE.unpack_from(body)
+    checksums = array("Q")
+    actions_start = _EPISODE.size + num_actions // checksum_interval * 8
+    checksums.frombytes(body[_EPISODE.size : actions_start])
+    actions = zlib.decompress(body[actions_start:])
+    if len(actions) != num_actions:
+        raise ValueError(f"expected {num_actions} actions, found {len(actions)}")
+    return Episode(
+        seed,
+        RANDOMIZERS[randomizer],
+        actions,
+        tuple(checksums),
+        checksum_interval,
+        score,
+        final_hash,
+    )
+
+
+def _scan_records(file, path: str) -> Tuple[List[int], int]:
+    """
+    Skips from header to header through an episode file, returning where every
+    whole record starts and where the last one ends
+    """
+    size = file.seek(0, 2)
+    offsets = []
+    offset = 0
+    while offset + _HEADER.size <= size:
+        file.seek(offset)
+        magic, version, length = _HEADER.unpack(file.read(_HEADER.size))
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} isn't an episode file at byte {offset}")
+        if offset + _HEADER.size + length > size:
+            break
+        offsets.append(offset)
+        offset += _HEADER.size + length
+    return offsets, offset
+
+
+class EpisodeWriter:
+    """
+    Appends episodes to a file, first cutting off a record left
+    cut short by a crash, so the records after it can still be read
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.file = open(path, "ab")
+        with open(path, "r+b") as file:
+            end = _scan_records(file, path)[1]
+            if end < file.seek(0, 2):
+                file.truncate(end)
+        self.file.seek(0, 2)
+
+    def write(self, episode: Episode) -> int:
+        """
+        Appends episode as a single write, and returns where its record starts
+        """
+        offset = self.file.tell()
+        self.file.write(encode_episode(episode))
+        self.file.flush()
+        return offset
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class EpisodeReader:
+    """
+    Reads the episodes of a file by index.
+    The file is indexed by skipping from header to header when opened,
+    stopping at a record cut short by a crash.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.file = open(path, "rb")
+        self.offsets: List[int] = _scan_records(self.file, path)[0]
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, idx: int) -> Episode:
+        self.file.seek(self.offsets[idx])
+        magic, version, length = _HEADER.unpack(self.file.read(_HEADER.size))
+        return decode_episode(self.file.read(length))
+
+    def __iter__(self) -> Iterator[Episode]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class EpisodeRecorder:
+    """
+    Records the episodes of one game into a writer.
+    Every episode is recorded with the game's seed for its pieces,
+    so it can be replayed on its own.
+    Games are assumed to only go forwards, restoring snapshots isn't recorded.
+    """
+
+    def __init__(
+        self,
+        writer: EpisodeWriter,
+        randomizer: str = "uniform",
+        checksum_interval: int = CHECKSUM_INTERVAL,
+    ) -> None:
+        self.writer = writer
+        self.randomizer = randomizer
+        self.checksum_interval = checksum_interval
+
+        self.seed = None
+        self.actions = bytearray()
+        self.checksums = []
+
+    def start(self, game: TetrisGame, seed: Optional[int] = None) -> int:
+        """
+        Resets game for a new episode, seeding it if seed is given, finishing
+        the episode before, and returns the seed of the new episode's pieces.
+        The game is reset the same as without recording.
+        """
+        if self.seed is not None:
+            self.finish(game)
+        game.reset(seed)
+        self.seed = game.episode_seed
+        return self.seed
+
+    def record(self, game: TetrisGame, action: int):
+        """
+        Records an action that game was just stepped with
+        """
+        if self.seed is None:
+            return
+        self.actions.append(action)
+        if len(self.actions) % self.checksum_interval == 0:
+            self.checksums.append(game.state_hash)
+
+    def finish(self, game: TetrisGame) -> Optional[int]:
+        """
+        Writes the episode so far, if anything happened in it,
+        and returns where its record starts
+        """
+        offset = None
+        if self.seed is not None and self.actions:
+            offset = self.writer.write(
+                Episode(
+                    self.seed,
+                    self.randomizer,
+                    bytes(self.actions),
+                    tuple(self.checksums),
+                    self.checksum_interval,
+                    game.score_keeper.score,
+                    game.state_hash,
+                )
+            )
+        self.seed = None
+        self.actions = bytearray()
+        self.checksums = []
+        return offset
+
+
+def replay(
+    episode: Episode, step: Optional[int] = None, grid_backend: str = "bitboard"
+) -> TetrisGame:
+    """
+    Plays episode again from its seed, up to step actions in
+    (or all of them), and returns the game.
+    Raises ReplayError as soon as the game doesn't match a checksum.
+    """
+    if step is None:
+        step = len(episode.actions)
+    assert 0 <= step <= len(episode.actions)
+
+    game = TetrisGame(grid_backend=grid_backend, randomizer=episode.randomizer)
+    game.reset(episode_seed=episode.seed)
+    interval = episode.checksum_interval
+    for idx in range(step):
+        game.step([episode.actions[idx]])
+        if (idx + 1) % interval == 0:
+            checksum = episode.checksums[(idx + 1) // interval - 1]
+            if game.state_hash != checksum:
+                raise ReplayError(f"state after action {idx + 1} doesn't match")
+
+    if step == len(episode.actions):
+        if game.state_hash != episode.final_hash:
+            raise ReplayError("final state doesn't match")
+        if game.score_keeper.score != episode.score:
+            raise ReplayError("final score doesn't match")
+    return game
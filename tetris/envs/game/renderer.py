@@ -0,0 +1,220 @@
+import pygame
+from typing import List, Sequence
+from tetris.envs.game.constants import *
+from tetris.envs.game.line_grid import LineGrid
+
+KEY_MAPPINGS = {
+    pygame.K_UP: ACTION_SPIN_RIGHT,
+    pygame.K_DOWN: ACTION_SOFT_DROP,
+    pygame.K_LEFT: ACTION_LEFT,
+    pygame.K_RIGHT: ACTION_RIGHT,
+    pygame.K_z: ACTION_SPIN_LEFT,
+    pygame.K_c: ACTION_HOLD,
+    pygame.K_SPACE: ACTION_HARD_DROP,
+    pygame.K_q: ACTION_NOTHING,
+}
+
+
+class TetrisRenderer:
+    """
+    Draws a TetrisGame with pygame and reads keyboard input for it.
+    Games only create one when they have a render mode,
+    so headless games never import pygame.
+    """
+
+    def __init__(self, render_mode: str):
+        # rgb-array frames are drawn without pygame, by Rasterizer
+        assert render_mode == "human"
+        self.render_mode = render_mode
+
+        pygame.init()
+        pygame.font.init()
+        self.screen = pygame.display.set_mode(FULL_WINDOW_SIZE)
+        pygame.display.set_caption("tetris")
+        try:
+            pygame.display.set_icon(pygame.image.load("tetris/envs/game/logo.png"))
+        except Exception:
+            pass
+        self.font = pygame.font.SysFont("Comic Sans", TEXT_SIZE)
+
+        # areas of the screen
+        self.player_rect = pygame.Rect(PLAYER_SCREEN_POS, PLAYER_DIMENSIONS)
+        self.score_rect = pygame.Rect(SCORE_SCREEN_POS, SCORE_DIMENSIONS)
+        self.next_rect = pygame.Rect(
+            NEXT_PIECES_SCREEN_POS[0],
+            NEXT_PIECES_SCREEN_POS[1] + NEXT_PIECES_LABEL_DIMENSIONS[1],
+            *NEXT_PIECES_BOX_DIMENSIONS,
+        )
+        self.holder_rect = pygame.Rect(
+            HOLDER_SCREEN_POS[0],
+            HOLDER_SCREEN_POS[1] + HOLDER_LABEL_DIMENSIONS[1],
+            *HOLDER_BOX_DIMENSIONS,
+        )
+
+        # everything that never changes: the backgrounds, labels and grid lines
+        self.background = pygame.Surface(FULL_WINDOW_SIZE)
+        self.background.fill(BG_COLOR)
+        self.background.fill(
+            BLACK, pygame.Rect(NEXT_PIECES_SCREEN_POS, NEXT_PIECES_DIMENSIONS)
+        )
+        self.background.blit(
+            self.font.render("Next:", True, TEXT_COLOR), NEXT_PIECES_SCREEN_POS
+        )
+        self.background.blit(
+            self.font.render("Hold:", True, TEXT_COLOR), HOLDER_SCREEN_POS
+        )
+        self.line_grid = LineGrid(self.background.subsurface(self.player_rect))
+        self.line_grid.draw()
+
+        # the grid lines and placed blocks, only redrawn when the grid changes
+        self.board_layer = pygame.Surface(PLAYER_DIMENSIONS)
+
+        # what is on the screen, to tell which areas need drawing again
+        self._board_key = None
+        self._piece_key = None
+        self._piece_rects = []
+        self._score = None
+        self._held_key = None
+        self._next_key = None
+        self.screen.blit(self.background, (0, 0))
+        self._drawn_once = False
+
+    def get_actions(self, game) -> List[int]:
+        """
+        Returns the actions for the keys pressed since the last call.
+        Ends the game if the window was closed.
+        """
+        actions = []
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                game.run = False
+            elif event.type == pygame.KEYDOWN and event.key in KEY_MAPPINGS:
+                actions.append(KEY_MAPPINGS[event.key])
+        return actions
+
+    def render(self, game):
+        """
+        Draws the parts of game that changed since the last frame,
+        and only updates those areas of the display
+        """
+        dirty = []
+
+        grid = game.dropped_piece_grid
+        board_key = (grid, grid.version)
+        if board_key != self._board_key:
+            self._board_key = board_key
+            self.board_layer.blit(self.background, (0, 0), self.player_rect)
+            self._draw_blocks(self.board_layer, grid.placed_blocks())
+            self.screen.blit(self.board_layer, self.player_rect)
+            dirty.append(self.player_rect)
+            # the piece was drawn over
+            self._piece_key = None
+            self._piece_rects = []
+
+        piece = game.cur_piece
+        piece_key = (piece.color, tuple([block.top_left for block in piece.blocks]))
+        if piece_key != self._piece_key:
+            self._piece_key = piece_key
+            # the board layer starts at the top left of the player area
+            board_offset = (-self.player_rect.x, -self.player_rect.y)
+            for rect in self._piece_rects:
+                self.screen.blit(self.board_layer, rect, rect.move(board_offset))
+            dirty.extend(self._piece_rects)
+
+            # the piece is drawn under the placed blocks
+            self._piece_rects = [
+                self._block_rect(self.player_rect, block.top_left)
+                for block in piece.blocks
+                if not grid[block.top_left]
+            ]
+            for rect in self._piece_rects:
+                self.screen.fill(piece.color, rect)
+            dirty.extend(self._piece_rects)
+
+        score = game.score_keeper.score
+        if score != self._score:
+            self._score = score
+            self.screen.blit(self.background, self.score_rect, self.score_rect)
+            self.screen.blit(
+                self.font.render(f"Score: {score}", True, WHITE), self.score_rect
+            )
+            dirty.append(self.score_rect)
+
+        next_key = tuple(game.next_pieces.next_pieces)
+        if next_key != self._next_key:
+            self._next_key = next_key
+            self.screen.blit(self.background, self.next_rect, self.next_rect)
+            for idx, piece_type in enumerate(next_key):
+                self._draw_arrangement(
+                    self.screen,
+                    piece_type.COLOR,
+                    (
+                        self.next_rect.x + SPACE_SIZE,
+                        self.next_rect.y + (3 * idx + 1) * SPACE_SIZE,
+                    ),
+                    piece_type.ROTATIONS[0].arrangement,
+                )
+            dirty.append(self.next_rect)
+
+        held_piece = game.holder.held_piece
+        held_key = None
+        if held_piece is not None:
+            held_key = (type(held_piece), held_piece.rotation)
+        if held_key != self._held_key:
+            self._held_key = held_key
+            self.screen.blit(self.background, self.holder_rect, self.holder_rect)
+            if held_piece is not None:
+                self._draw_arrangement(
+                    self.screen,
+                    held_piece.color,
+                    (self.holder_rect.x + SPACE_SIZE, self.holder_rect.y + SPACE_SIZE),
+                    held_piece.arrangement,
+                )
+            dirty.append(self.holder_rect)
+
+        if self._drawn_once:
+            pygame.display.update(dirty)
+        else:
+            pygame.display.update()
+            self._drawn_once = True
+
+    def wait(self, milliseconds: int):
+        pygame.time.wait(milliseconds)
+
+    def close(self):
+        pygame.quit()
+
+    def _block_rect(self, area: pygame.Rect, coord) -> pygame.Rect:
+        """
+        The rect of the block in space coord of an area of the screen
+        """
+        return pygame.Rect(
+            area.x + coord[0] * SPACE_SIZE,
+            area.y + coord[1] * SPACE_SIZE,
+            BLOCK_SIZE,
+            BLOCK_SIZE,
+        )
+
+    def _draw_blocks(self, screen: pygame.Surface, blocks):
+        origin = screen.get_rect()
+        for block in blocks:
+            screen.fill(block.color, self._block_rect(origin, block.top_left))
+
+    def _draw_arrangement(
+        self,
+        screen: pygame.Surface,
+        color: tuple,
+        top_left: tuple,
+        arrangement: Sequence[Sequence[int]],
+    ):
+        for coord in arrangement:
+            pygame.draw.rect(
+                screen,
+                color,
+                pygame.Rect(
+                    top_left[0] + coord[0] * SPACE_SIZE,
+                    top_left[1] + coord[1] * SPACE_SIZE,
+                    BLOCK_SIZE,
+                    BLOCK_SIZE,
+                ),
+            )
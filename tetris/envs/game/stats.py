@@ -0,0 +1,47 @@
+from collections import defaultdict
+from time import perf_counter
+from typing import Callable
+
+
+class StepStats:
+    """
+    Cumulative time and call counts per phase of a step, and counts of game events.
+    Phases are timed by wrapping the methods that run them, so nothing is
+    timed, and nothing costs anything, until a game opts in.
+    """
+
+    def __init__(self):
+        self.times = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.events = defaultdict(int)
+
+    def timed(self, phase: str, function: Callable) -> Callable:
+        """
+        Returns function wrapped so its time and calls are added to phase
+        """
+        times, calls = self.times, self.calls
+
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                times[phase] += perf_counter() - start
+                calls[phase] += 1
+
+        return wrapper
+
+    def count(self, event: str, amount: int = 1):
+        self.events[event] += amount
+
+    def reset(self):
+        self.times.clear()
+        self.calls.clear()
+        self.events.clear()
+
+    def as_dict(self) -> dict:
+        return {
+            "time": dict(self.times),
+            "calls": dict(self.calls),
+            "events": dict(self.events),
+        }
@@ -0,0 +1,123 @@
+import random
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Sequence
+from tetris.envs.game.constants import *
+from tetris.envs.game.bitboard import FULL_ROW, GRID_HEIGHT, GRID_WIDTH, piece_masks
+
+# zobrist hashing: every used space has a random 64 bit key, and a board hashes
+# to the xor of the keys of its used spaces, so locking a piece only xors in
+# the keys of its spaces. Keys come from fixed seeds, so hashes are the same
+# in every process.
+
+_cell_random = random.Random("tetris zobrist cells")
+CELL_KEYS = tuple(
+    tuple(_cell_random.getrandbits(64) for x in range(GRID_WIDTH))
+    for y in range(GRID_HEIGHT)
+)
+
+
+def _build_row_keys(cell_keys):
+    # the xor of the keys of every used space, for every mask a row can have
+    keys = [0] * (FULL_ROW + 1)
+    for mask in range(1, FULL_ROW + 1):
+        low_bit = mask & -mask
+        keys[mask] = keys[mask ^ low_bit] ^ cell_keys[low_bit.bit_length() - 1]
+    return tuple(keys)
+
+
+ROW_KEYS = tuple(_build_row_keys(cell_keys) for cell_keys in CELL_KEYS)
+
+_piece_keys = {}
+_hold_keys = {}
+
+
+def hash_rows(rows: Sequence[int]) -> int:
+    """
+    Returns the hash of a board given as one bitmask per row
+    """
+    ret = 0
+    for row_keys, row in zip(ROW_KEYS, rows):
+        ret ^= row_keys[row]
+    return ret
+
+
+def hash_spaces(piece_type: type, rotation: int, x: int, y: int) -> int:
+    """
+    Returns what locking the piece there xors into the board hash
+    """
+    ret = 0
+    for dy, mask in piece_masks(piece_type.ROTATIONS[rotation].arrangement)[2]:
+        ret ^= ROW_KEYS[y + dy][mask << x]
+    return ret
+
+
+def hash_piece(piece_type: type, rotation: int, x: int, y: int) -> int:
+    """
+    Returns the key of a piece in play, with its top left at (x, y) in spaces
+    """
+    keys = _piece_keys.get(piece_type)
+    if keys is None:
+        piece_random = random.Random(f"tetris zobrist {piece_type.__name__}")
+        keys = _piece_keys[piece_type] = tuple(
+            tuple(
+                tuple(piece_random.getrandbits(64) for y in range(GRID_HEIGHT))
+                for x in range(GRID_WIDTH)
+            )
+            for rotation in range(4)
+        )
+    return keys[rotation][x][y]
+
+
+def hash_hold(held_type: Optional[type], holdable: bool) -> int:
+    """
+    Returns the key of what is held and whether holding is allowed
+    """
+    key = (held_type, holdable)
+    ret = _hold_keys.get(key)
+    if ret is None:
+        name = held_type.__name__ if held_type is not None else None
+        ret = _hold_keys[key] = random.Random(
+            f"tetris zobrist hold {name} {holdable}"
+        ).getrandbits(64)
+    return ret
+
+
+class TranspositionTable:
+    """
+    Bounded cache for search results, keyed by anything hashable
+    (usually including a zobrist hash). Once full, the least recently
+    used entries are evicted first.
+    """
+
+    def __init__(self, max_entries: int = 1 << 16):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.entries
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
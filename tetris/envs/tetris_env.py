@@ -1,9 +1,11 @@
 from math import sqrt
 import gym
-from typing import Optional
+from typing import List, NamedTuple, Optional, Tuple
 from tetris.envs.game.game import *
+from tetris.envs.game.bitboard import ROW_TUPLES
+from tetris.envs.game.recording import EpisodeRecorder, EpisodeWriter
+from tetris.envs.game.zobrist import TranspositionTable
 from gym import spaces
-import pygame
 import numpy
 
 
@@ -17,26 +19,26 @@ PIECE_TO_NUMBER = {
     IPiece: 6,
     TPiece: 7,
 }
-ACTION_MAPPINGS = {
-    0: pygame.event.Event(pygame.KEYDOWN, {"key": pygame.K_UP}),
-    1: pygame.event.Event(pygame.KEYDOWN, {"key": pygame.K_DOWN}),
-    2: pygame.event.Event(pygame.KEYDOWN, {"key": pygame.K_LEFT}),
-    3: pygame.event.Event(pygame.KEYDOWN, {"key": pygame.K_RIGHT}),
-    4: pygame.event.Event(pygame.KEYDOWN, {"key": pygame.K_z}),
-    5: pygame.event.Event(pygame.KEYDOWN, {"key": pygame.K_c}),
-    6: pygame.event.Event(pygame.KEYDOWN, {"key": pygame.K_SPACE}),
-    7: pygame.event.Event(pygame.KEYDOWN, {"key": pygame.K_q}),  # don't do anything
-}
-keys = [
-    pygame.event.Event(pygame.KEYDOWN, {"key": pygame.K_UP}),
-    pygame.event.Event(pygame.KEYDOWN, {"key": pygame.K_DOWN}),
-    pygame.event.Event(pygame.KEYDOWN, {"key": pygame.K_LEFT}),
-    pygame.event.Event(pygame.KEYDOWN, {"key": pygame.K_RIGHT}),
-    pygame.event.Event(pygame.KEYDOWN, {"key": pygame.K_z}),
-    pygame.event.Event(pygame.KEYDOWN, {"key": pygame.K_c}),
-    pygame.event.Event(pygame.KEYDOWN, {"key": pygame.K_SPACE}),
-    pygame.event.Event(pygame.KEYDOWN, {"key": pygame.K_q}),
-]
+
+# dropped piece grid, held piece, whether you can hold and the next 3 pieces
+OBS_DIM = PLAYER_GRID_DIMENSIONS[0] * PLAYER_GRID_DIMENSIONS[1] + 5
+
+# macro actions drop the piece straight down in a rotation and column,
+# numbered rotation * grid width + column, and the last one holds
+NUM_MACRO_ACTIONS = 4 * PLAYER_GRID_DIMENSIONS[0] + 1
+MACRO_HOLD = NUM_MACRO_ACTIONS - 1
+# ticks a macro action gets before the piece is hard dropped wherever it is
+MAX_MACRO_TICKS = 64
+
+
+class EnvSnapshot(NamedTuple):
+    """
+    Immutable copy of an env, made by TetrisEnv.snapshot
+    """
+
+    game: GameSnapshot
+    cur_timesteps: int
+    past_score: int
 
 
 class TetrisEnv(gym.Env):
@@ -44,6 +46,9 @@ class TetrisEnv(gym.Env):
         "render_modes": ["human", "rgb-array"],
         "reward_modes": ["sparse", "distance", "solid", "sparsev2"],
         "step_modes": ["positive", "negative", "none"],
+        "grid_backends": ["bitboard", "object"],
+        "randomizers": ["uniform", "bag"],
+        "action_modes": ["keys", "macro"],
     }
 
     def __init__(
@@ -54,19 +59,84 @@ class TetrisEnv(gym.Env):
         max_timesteps: Optional[int] = 5000,
         penalize_illegal: Optional[bool] = True,
         illegal_penalty: Optional[int] = -10,
+        grid_backend: Optional[str] = None,
+        obs_dtype: Optional[type] = None,
+        copy_obs: Optional[bool] = True,
+        collect_stats: Optional[bool] = False,
+        metrics: Optional[Metrics] = None,
+        randomizer: Optional[str] = None,
+        seed: Optional[int] = None,
+        episode_writer: Optional[EpisodeWriter] = None,
+        render_downsample: Optional[int] = 1,
+        action_mode: Optional[str] = None,
+        frame_skip: Optional[int] = 1,
+        repeat_action: Optional[bool] = False,
+        best_position_table: Optional[TranspositionTable] = None,
     ) -> None:
         self.render_mode = render_mode
 
-        self.action_space = spaces.Discrete(len(KEY_MAPPINGS))
+        # keys press one key a tick. frame_skip runs that many ticks a step,
+        # with nothing pressed after the first unless the action is repeated.
+        # macro places the whole piece in one step, see _macro_step
+        if (
+            action_mode is not None
+            and action_mode in TetrisEnv.metadata["action_modes"]
+        ):
+            self.action_mode = action_mode
+        else:
+            self.action_mode = "keys"  # keys are default
+        assert frame_skip >= 1
+        self.frame_skip = frame_skip
+        self.repeat_action = repeat_action
+        self._macro_key = None
+
+        if self.action_mode == "macro":
+            self.action_space = spaces.Discrete(NUM_MACRO_ACTIONS)
+        else:
+            self.action_space = spaces.Discrete(NUM_ACTIONS)
 
-        self.observation_space = spaces.Box(
-            0,
-            7,
-            (PLAYER_GRID_DIMENSIONS[0] * PLAYER_GRID_DIMENSIONS[1] + 1,),
-            dtype=numpy.int64,
-        )
+        if (
+            grid_backend is not None
+            and grid_backend in TetrisEnv.metadata["grid_backends"]
+        ):
+            self.grid_backend = grid_backend
+        else:
+            self.grid_backend = "bitboard"  # bitboard is default
 
-        self.game = TetrisGame(render_mode=self.render_mode)
+        if randomizer is not None and randomizer in TetrisEnv.metadata["randomizers"]:
+            self.randomizer = randomizer
+        else:
+            self.randomizer = "uniform"  # uniform is default
+
+        self.game = TetrisGame(
+            render_mode=self.render_mode,
+            grid_backend=self.grid_backend,
+            metrics=metrics,
+            seed=seed,
+            randomizer=self.randomizer,
+            render_downsample=render_downsample,
+        )
+        self.metrics = self.game.metrics
+
+        # seeds and actions of every episode, written to episode_writer
+        self.recorder = None
+        if episode_writer is not None:
+            self.recorder = EpisodeRecorder(episode_writer, self.randomizer)
+            self.recorder.start(self.game, seed)
+
+        # observations are written in place into one buffer.
+        # without copy_obs, a read-only view of it is returned,
+        # which is overwritten by the next step or reset
+        self.obs_dtype = numpy.dtype(
+            obs_dtype if obs_dtype is not None else numpy.int64
+        )
+        self.copy_obs = copy_obs
+        self.observation_space = spaces.Box(0, 7, (OBS_DIM,), dtype=self.obs_dtype)
+        self._obs = numpy.zeros(OBS_DIM, dtype=self.obs_dtype)
+        self._obs_grid = self._obs[: OBS_DIM - 5]
+        self._obs_view = self._obs.view()
+        self._obs_view.flags.writeable = False
+        self._row_values = numpy.array(ROW_TUPLES, dtype=self.obs_dtype)
         self.past_score = 0
 
         self.reward_functions = {
@@ -93,26 +163,74 @@ class TetrisEnv(gym.Env):
         else:
             self.step_mode = "positive"  # positive step by default
 
+        # best positions for the distance reward, kept across episodes.
+        # One table can be shared between envs
+        if best_position_table is None:
+            best_position_table = TranspositionTable()
+        self.best_position_table = best_position_table
+
         self.penalize_illegal = penalize_illegal
         self.penalties = {False: lambda: 0, True: self._penalize_illegal_moves}
         self.illegal_penalty = illegal_penalty
 
-        print(f"using reward mode {self.reward_mode}")
-        print(f"using step mode {self.step_mode}")
-        print(f"{'' if self.penalize_illegal else 'not '}penalizing illegal moves")
+        self.metrics.set_config(
+            reward_mode=self.reward_mode,
+            step_mode=self.step_mode,
+            penalize_illegal=self.penalize_illegal,
+            randomizer=self.randomizer,
+            action_mode=self.action_mode,
+            frame_skip=self.frame_skip,
+        )
 
         self.cur_timesteps = 0
         self.max_timesteps = max_timesteps
 
+        # ticks skipped with nothing pressed go straight to the next gravity tick
+        # or lock when nothing needs to see the ticks in between:
+        # rewards that don't depend on where the piece is, no recording, no stats
+        self._fast_forward_idle = (
+            self.frame_skip > 1
+            and not self.repeat_action
+            and self.reward_mode in ("sparse", "sparsev2")
+            and self.recorder is None
+            and not collect_stats
+        )
+
+        # timings and event counts, reset every episode
+        self.collect_stats = collect_stats
+        if self.collect_stats:
+            stats = self.game.enable_stats()
+            self._get_obs = stats.timed("obs", self._get_obs)
+            self._get_reward = stats.timed("reward", self._get_reward)
+            self.get_invalid_action_mask = stats.timed(
+                "mask", self.get_invalid_action_mask
+            )
+
     def reset(self, seed=None, return_info=False, options=None):
         self.past_score = 0
         self.cur_timesteps = 0
-        self.game.reset()
+        if self.collect_stats:
+            self.game.stats.reset()
+        if self.recorder is not None:
+            self.recorder.start(self.game, seed)
+        else:
+            self.game.reset(seed)
 
         if return_info:
             return self._get_obs(), self._get_info()
         return self._get_obs()
 
+    def snapshot(self) -> EnvSnapshot:
+        """
+        Returns an immutable copy of the env that restore can go back to
+        """
+        return EnvSnapshot(self.game.snapshot(), self.cur_timesteps, self.past_score)
+
+    def restore(self, snapshot: EnvSnapshot):
+        self.game.restore(snapshot.game)
+        self.cur_timesteps = snapshot.cur_timesteps
+        self.past_score = snapshot.past_score
+
     def render(self, render_mode=None):
         if render_mode is None:
             render_mode = self.render_mode
@@ -120,25 +238,150 @@ class TetrisEnv(gym.Env):
             self.render_mode = render_mode
 
         assert self.render_mode == "human" or self.render_mode == "rgb-array"
-        return self.game.render()
+        frame = self.game.render()
+        # rgb-array frames are drawn into one buffer, like observations
+        if frame is not None and self.copy_obs:
+            return frame.copy()
+        return frame
 
     def step(self, action):
-        try:
-            self.game.step([ACTION_MAPPINGS[action]])
-        except Exception:
-            self.game.step([ACTION_MAPPINGS[action.item()]])  # happens for dqn
+        action = int(action)  # int() since dqn passes numpy arrays
+        if self.action_mode == "macro":
+            reward, done = self._macro_step(action)
+        else:
+            reward, done = self._tick(action)
+            if self._fast_forward_idle and not done:
+                reward, done = self._fast_forward(reward, self.frame_skip - 1)
+            else:
+                for i in range(1, self.frame_skip):
+                    if done:
+                        break
+                    tick_reward, done = self._tick(
+                        action if self.repeat_action else ACTION_NOTHING
+                    )
+                    reward += tick_reward
+        return self._get_obs(), reward, done, self._get_info()
+
+    def _tick(self, action: int, legal: Optional[bool] = None) -> Tuple[float, bool]:
+        """
+        Advances the game by one tick, returning the reward and whether it is done.
+        legal overrides whether the game thinks the move was legal,
+        before the game counts it.
+        """
+        self.game.step([action], legal)
         self.cur_timesteps += 1
         if self.cur_timesteps >= self.max_timesteps:
             self.game.run = False
-        return self._get_obs(), self._get_reward(), self._get_done(), self._get_info()
-
-    def get_invalid_action_mask(self):
-        ret = [True for _ in range(len(keys))]
-        for idx in range(len(keys)):
-            event = keys[idx]
-            if not self.game.is_move_valid(event):
-                ret[idx] = False
-        return ret
+        done = self._get_done()
+        if self.recorder is not None:
+            self.recorder.record(self.game, action)
+            if done:
+                self.recorder.finish(self.game)
+        return self._get_reward(), done
+
+    def _fast_forward(self, reward: float, ticks: int) -> Tuple[float, bool]:
+        """
+        Runs up to ticks ticks with nothing pressed, like calling _tick with
+        ACTION_NOTHING until done, adding their rewards to reward
+        """
+        ticks = min(ticks, self.max_timesteps - self.cur_timesteps)
+        game = self.game
+        while ticks > 0 and game.run:
+            # the sparse rewards only change when a piece locks, and nothing pressed
+            # is never illegal, so every tick before a lock gets the same reward
+            idle_reward = (
+                self.reward_functions[self.reward_mode]()
+                + self.step_function[self.step_mode]()
+            )
+            piece = game.cur_piece
+            advanced = game.fast_forward(ticks)
+            idle_ticks = advanced - (game.cur_piece is not piece)
+            # added one at a time to sum to exactly what ticking would
+            for i in range(idle_ticks):
+                reward += idle_reward
+            if idle_ticks < advanced:
+                reward += self._get_reward()
+            ticks -= advanced
+            self.cur_timesteps += advanced
+
+        if self.cur_timesteps >= self.max_timesteps:
+            game.run = False
+        return reward, self._get_done()
+
+    def _macro_step(self, action: int) -> Tuple[float, bool]:
+        """
+        Spins the piece to the macro action's rotation, shifts it to its column and
+        hard drops it, a key a tick, and returns the rewards of all the ticks added up.
+        The keys are worked out again every tick, since gravity can move the piece,
+        and if they get blocked the piece is hard dropped where it is.
+        A macro action that can't be done is an illegal move that does nothing.
+        """
+        if action == MACRO_HOLD:
+            return self._tick(ACTION_HOLD, legal=self.game.holdable)
+        if self._macro_targets()[0][action] is None:
+            return self._tick(ACTION_NOTHING, legal=False)
+
+        game = self.game
+        piece = game.cur_piece
+        rotation, x = divmod(action, PLAYER_GRID_DIMENSIONS[0])
+        reward = 0.0
+        for i in range(MAX_MACRO_TICKS):
+            drop_path = get_drop_path(
+                game.dropped_piece_grid.row_masks(),
+                type(piece),
+                rotation,
+                x,
+                piece_placement(piece),
+            )
+            # keys on the path are legal, even a hard drop of a piece already
+            # resting where it should be
+            if drop_path is not None:
+                tick_reward, done = self._tick(drop_path[0][0], legal=True)
+            else:
+                tick_reward, done = self._tick(ACTION_HARD_DROP)
+            reward += tick_reward
+            if done or game.cur_piece is not piece:
+                return reward, done
+        tick_reward, done = self._tick(ACTION_HARD_DROP)
+        return reward + tick_reward, done
+
+    def _macro_targets(self) -> Tuple[List[Optional[Placement]], numpy.ndarray]:
+        """
+        Returns where the piece would come to rest for every macro action,
+        None where it can't be done, and the read-only mask of the valid ones.
+        Both are reused until the piece or the grid changes.
+        """
+        game = self.game
+        piece = game.cur_piece
+        grid = game.dropped_piece_grid
+        start = piece_placement(piece)
+        key = (piece, start, grid, grid.version, game.holdable)
+        if key == self._macro_key:
+            return self._macro_targets_cache
+
+        rows = grid.row_masks()
+        piece_type = type(piece)
+        targets = []
+        for rotation in range(4):
+            for x in range(PLAYER_GRID_DIMENSIONS[0]):
+                drop_path = get_drop_path(rows, piece_type, rotation, x, start)
+                targets.append(drop_path[1] if drop_path is not None else None)
+
+        mask = numpy.zeros(NUM_MACRO_ACTIONS, dtype=bool)
+        mask[:MACRO_HOLD] = [target is not None for target in targets]
+        mask[MACRO_HOLD] = game.holdable
+        mask.flags.writeable = False
+        self._macro_key = key
+        self._macro_targets_cache = (targets, mask)
+        return self._macro_targets_cache
+
+    def get_invalid_action_mask(self) -> numpy.ndarray:
+        """
+        Returns a read-only bool array that is True for the actions that are valid
+        """
+        if self.action_mode == "macro":
+            return self._macro_targets()[1]
+        return self.game.get_action_mask()
 
     def reward(self):
         return self._get_reward()
@@ -148,44 +391,35 @@ class TetrisEnv(gym.Env):
         Returns an observation of the dropped piece grid, held piece, whether you
         can hold or not, and the next pieces
         """
+        grid_width = PLAYER_GRID_DIMENSIONS[0]
+
+        # dropped piece grid, with the current piece as 2s
+        numpy.take(
+            self._row_values,
+            self.game.dropped_piece_grid.row_masks(),
+            axis=0,
+            out=self._obs_grid.reshape(-1, grid_width),
+        )
+        for block in self.game.cur_piece.blocks:
+            x, y = block.top_left
+            self._obs_grid[y * grid_width + x] = 2
+
         # held piece
-        for T, val in PIECE_TO_NUMBER.items():
-            if (
-                self.game.holder.held_piece == T
-                or type(self.game.holder.held_piece) == T
-            ):
-                held_piece_val = val
-                break
+        held_piece = self.game.holder.held_piece
+        self._obs[-5] = PIECE_TO_NUMBER[
+            None if held_piece is None else type(held_piece)
+        ]
 
         # whether you can hold or not
-        is_hold_valid = 1 if self.game.holdable else 0
+        self._obs[-4] = 1 if self.game.holdable else 0
 
         # next pieces
-        next_pieces = []
-        for piece in self.game.next_pieces.next_pieces:
-            for T, val in PIECE_TO_NUMBER.items():
-                if piece == T or type(piece) == T:
-                    next_pieces.append(val)
-                    break
-
-        # dropped piece grid
-        dropped_piece_grid = list(self.game.dropped_piece_grid.numeric_used_spaces)
-        for y in range(len(dropped_piece_grid)):
-            dropped_piece_grid[y] = list(dropped_piece_grid[y])
-        for block in self.game.cur_piece.blocks:
-            temp = block.top_left // SPACE_SIZE
-            dropped_piece_grid[temp.y][temp.x] = 2
-        for y in range(len(dropped_piece_grid)):
-            dropped_piece_grid[y] = tuple(dropped_piece_grid[y])
-
-        dropped_piece_grid = list(
-            numpy.array(tuple(dropped_piece_grid), dtype=numpy.int64).flatten()
-        )
-        dropped_piece_grid.append(held_piece_val)
-        dropped_piece_grid.append(is_hold_valid)
-        dropped_piece_grid.extend(next_pieces)
+        for idx, piece in enumerate(self.game.next_pieces.next_pieces):
+            self._obs[idx - 3] = PIECE_TO_NUMBER[piece]
 
-        return numpy.array(dropped_piece_grid)
+        if self.copy_obs:
+            return self._obs.copy()
+        return self._obs_view
 
     def _get_reward(self):
         return (
@@ -207,7 +441,7 @@ class TetrisEnv(gym.Env):
         # get current height
         max_depth = 0
         for block in self.game.cur_piece.blocks:
-            max_depth = max(max_depth, block.top_left.y // SPACE_SIZE)
+            max_depth = max(max_depth, block.top_left.y)
         down_score = self._sinusoidal_amplify(max_depth / 19) * 1  # 0.01 is max
 
         solid_score = 0
@@ -243,9 +477,10 @@ class TetrisEnv(gym.Env):
         """
 
         def distance(piece: Piece):
-            ideal_ul, ideal_arrangement = piece.get_best_position()
+            ideal_ul, ideal_arrangement = self._best_position(piece)
 
-            dist = sqrt(
+            # in pixels, which is what the reward was tuned with
+            dist = SPACE_SIZE * sqrt(
                 (ideal_ul.x - piece.top_left.x) ** 2
                 + (ideal_ul.y - piece.top_left.y) ** 2
             )
@@ -265,12 +500,39 @@ class TetrisEnv(gym.Env):
             )
         return ret
 
+    def _best_position(self, piece: Piece):
+        """
+        Returns piece.get_best_position(), which only changes with the grid,
+        the type of the piece and the rotation its search starts from
+        """
+        # what is held is left out: the search only looks at the piece and the grid,
+        # and holding swaps in another piece, whose type and rotation are keyed.
+        # The rotation is keyed since ties go to the first rotation the search tries
+        key = (self.game.dropped_piece_grid.board_hash, type(piece), piece.rotation)
+        best_position = self.best_position_table.get(key)
+        if best_position is None:
+            best_position = piece.get_best_position()
+            self.best_position_table.put(key, best_position)
+        return best_position
+
     def _get_done(self):
         return not self.game.run
 
+    def stats(self) -> dict:
+        """
+        Returns the time and calls of each phase and the event counts
+        of the episode so far, or nothing if stats aren't collected
+        """
+        if not self.collect_stats:
+            return {}
+        return self.game.stats.as_dict()
+
     def _get_info(self):
+        if self.collect_stats and not self.game.run:
+            return {"stats": self.stats()}
         return {}
 
     def close(self):
-        self.game.run = False
-        pygame.quit()
+        if self.recorder is not None:
+            self.recorder.finish(self.game)
+        self.game.close()
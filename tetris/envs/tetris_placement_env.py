@@ -0,0 +1,36 @@
+from tetris.envs.tetris_env import *
+from tetris.envs.game.afterstates import Afterstates, get_afterstates
+
+
+class TetrisPlacementEnv(TetrisEnv):
+    """
+    TetrisEnv where every step places a whole piece. The action is a placement,
+    numbered rotation * grid width + column, and the piece is spun, shifted and
+    hard dropped there, so the step ends with it locked. The last action holds.
+    Placements that can't be reached are masked by get_invalid_action_mask.
+    Observations and reward modes are the same as TetrisEnv's, with the rewards
+    of the ticks a placement takes added up.
+    """
+
+    def __init__(self, **kwargs) -> None:
+        assert kwargs.get("action_mode", "macro") == "macro"
+        kwargs["action_mode"] = "macro"
+        super().__init__(**kwargs)
+
+    def get_afterstates(
+        self, dtype=numpy.float32
+    ) -> Tuple[numpy.ndarray, Afterstates]:
+        """
+        Returns the valid placement actions and the afterstate of each,
+        in the same order. Holding leaves no afterstate, so it isn't included.
+        Near the top of the grid, gravity can lock the piece before it gets to
+        its placement, leaving a different board.
+        """
+        targets = self._macro_targets()[0]
+        actions = [action for action, target in enumerate(targets) if target]
+        piece_type = type(self.game.cur_piece)
+        return numpy.array(actions, dtype=numpy.int64), get_afterstates(
+            self.game.dropped_piece_grid.row_masks(),
+            [(False, piece_type, targets[action]) for action in actions],
+            dtype,
+        )
@@ -0,0 +1,362 @@
+import multiprocessing
+import os
+import random
+from multiprocessing.sharedctypes import RawArray
+from typing import List, Optional
+from gym import spaces
+import numpy
+from tetris.envs.game.constants import *
+from tetris.envs.game.recording import EpisodeWriter
+from tetris.envs.tetris_env import NUM_MACRO_ACTIONS, OBS_DIM, TetrisEnv
+
+# typecodes of the shared arrays, matching the dtypes in _SharedArrays
+_BUFFER_TYPECODES = {
+    "obs": "q",
+    "final_obs": "q",
+    "rewards": "d",
+    "dones": "b",
+    "masks": "b",
+    "actions": "q",
+}
+
+# times a worker is restarted before the vec env gives up on it
+MAX_RESTARTS = 3
+
+# TetrisEnv arguments set by the vec env itself, and what to use instead
+_RESERVED_ENV_KWARGS = {
+    "seed": "seed",
+    "episode_writer": "record_dir",
+    "copy_obs": None,
+}
+
+
+class _SharedArrays:
+    """
+    NumPy views of the shared buffers of every game
+    """
+
+    def __init__(self, buffers: dict, num_envs: int):
+        self.obs = numpy.frombuffer(buffers["obs"], dtype=numpy.int64).reshape(
+            num_envs, OBS_DIM
+        )
+        self.final_obs = numpy.frombuffer(
+            buffers["final_obs"], dtype=numpy.int64
+        ).reshape(num_envs, OBS_DIM)
+        self.rewards = numpy.frombuffer(buffers["rewards"], dtype=numpy.float64)
+        self.dones = numpy.frombuffer(buffers["dones"], dtype=numpy.bool_)
+        self.masks = numpy.frombuffer(buffers["masks"], dtype=numpy.bool_).reshape(
+            num_envs, -1
+        )
+        self.actions = numpy.frombuffer(buffers["actions"], dtype=numpy.int64)
+
+
+def _worker(
+    remote,
+    parent_remote,
+    buffers: dict,
+    num_envs: int,
+    start: int,
+    stop: int,
+    env_kwargs: dict,
+    seed: Optional[int],
+    record_path: Optional[str],
+):
+    """
+    Runs the games start to stop, writing their results into the shared arrays
+    """
+    parent_remote.close()
+
+    if seed is not None:
+        random.seed(seed)
+    arrays = _SharedArrays(buffers, num_envs)
+    # every game of the worker appends to the same file
+    writer = EpisodeWriter(record_path) if record_path is not None else None
+    envs = [
+        TetrisEnv(copy_obs=False, episode_writer=writer, **env_kwargs)
+        for idx in range(start, stop)
+    ]
+
+    def reset():
+        for idx, env in enumerate(envs, start):
+            arrays.obs[idx] = env.reset()
+            arrays.masks[idx] = env.get_invalid_action_mask()
+
+    reset()
+    remote.send("ready")
+    try:
+        while True:
+            command, data = remote.recv()
+            if command == "step":
+                for idx, env in enumerate(envs, start):
+                    obs, reward, done, info = env.step(arrays.actions[idx])
+                    if done:
+                        arrays.final_obs[idx] = obs
+                        obs = env.reset()
+                    arrays.obs[idx] = obs
+                    arrays.rewards[idx] = reward
+                    arrays.dones[idx] = done
+                    arrays.masks[idx] = env.get_invalid_action_mask()
+            elif command == "reset":
+                if data is not None:
+                    random.seed(data)
+                reset()
+            elif command == "close":
+                break
+            remote.send("ok")
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        for env in envs:
+            env.close()
+        if writer is not None:
+            writer.close()
+        remote.close()
+
+
+class TetrisSubprocVecEnv:
+    """
+    Runs num_envs TetrisEnv games split across worker processes.
+    Workers write observations, rewards, dones and action masks straight into
+    shared memory, so only short commands go through the pipes.
+    Games that end are reset automatically. If a worker dies, it is restarted
+    with new games and its old games are reported as done, up to max_restarts
+    times per worker. After that, or if a worker dies before its games are
+    reset, RuntimeError is raised.
+    With record_dir, every worker records its episodes to a file of its own there.
+    env_kwargs are passed to every TetrisEnv, apart from seed and episode_writer,
+    which come from seed and record_dir so that every game is different.
+    """
+
+    def __init__(
+        self,
+        num_envs: int,
+        num_workers: Optional[int] = None,
+        env_kwargs: Optional[dict] = None,
+        seed: Optional[int] = None,
+        start_method: Optional[str] = None,
+        record_dir: Optional[str] = None,
+        max_restarts: int = MAX_RESTARTS,
+    ) -> None:
+        self.num_envs = num_envs
+        self.num_workers = min(num_envs, num_workers or os.cpu_count() or 1)
+        self.env_kwargs = dict(env_kwargs) if env_kwargs is not None else {}
+        for key, instead in _RESERVED_ENV_KWARGS.items():
+            if key in self.env_kwargs:
+                hint = f", pass {instead} to the vec env instead" if instead else ""
+                raise ValueError(f"env_kwargs can't set {key}{hint}")
+        self.seed = seed
+        self.record_dir = record_dir
+        self.max_restarts = max_restarts
+
+        if self.env_kwargs.get("action_mode") == "macro":
+            self.num_actions = NUM_MACRO_ACTIONS
+        else:
+            self.num_actions = NUM_ACTIONS
+        self.single_action_space = spaces.Discrete(self.num_actions)
+        self.single_observation_space = spaces.Box(0, 7, (OBS_DIM,), dtype=numpy.int64)
+        self.action_space = spaces.MultiDiscrete([self.num_actions] * num_envs)
+        self.observation_space = spaces.Box(
+            0, 7, (num_envs, OBS_DIM), dtype=numpy.int64
+        )
+
+        self._buffers = {
+            "obs": RawArray(_BUFFER_TYPECODES["obs"], num_envs * OBS_DIM),
+            "final_obs": RawArray(_BUFFER_TYPECODES["final_obs"], num_envs * OBS_DIM),
+            "rewards": RawArray(_BUFFER_TYPECODES["rewards"], num_envs),
+            "dones": RawArray(_BUFFER_TYPECODES["dones"], num_envs),
+            "masks": RawArray(
+                _BUFFER_TYPECODES["masks"], num_envs * self.num_actions
+            ),
+            "actions": RawArray(_BUFFER_TYPECODES["actions"], num_envs),
+        }
+        self._arrays = _SharedArrays(self._buffers, num_envs)
+
+        # contiguous slices of games per worker
+        bounds = numpy.linspace(0, num_envs, self.num_workers + 1).astype(int)
+        self._slices = [
+            (int(bounds[w]), int(bounds[w + 1])) for w in range(self.num_workers)
+        ]
+
+        self._context = multiprocessing.get_context(start_method)
+        self._processes = [None] * self.num_workers
+        self._remotes = [None] * self.num_workers
+        self._restarts = [0] * self.num_workers
+        self.closed = False
+        try:
+            for w in range(self.num_workers):
+                self._start_worker(w)
+        except BaseException:
+            self.close()
+            raise
+        self._last_obs = self._arrays.obs.copy()
+
+    def reset(self, seed=None, return_info=False, options=None):
+        if seed is not None:
+            self.seed = seed
+        self._run("reset", [self._worker_seed(w) for w in range(self.num_workers)])
+
+        self._last_obs = self._arrays.obs.copy()
+        if return_info:
+            return self._last_obs.copy(), {}
+        return self._last_obs.copy()
+
+    def step(self, actions):
+        """
+        Advances every game by one tick.
+        Returns (observations, rewards, dones, infos), where infos holds the
+        observations that finished games ended on, since those games are
+        reset before returning.
+        """
+        self._arrays.actions[:] = numpy.asarray(actions, dtype=numpy.int64).reshape(
+            self.num_envs
+        )
+        restarted = self._run("step", [None] * self.num_workers)
+
+        obs = self._arrays.obs.copy()
+        rewards = self._arrays.rewards.copy()
+        dones = self._arrays.dones.copy()
+        final_obs = self._arrays.final_obs
+
+        for w in restarted:
+            # the games of a crashed worker end where they last were
+            start, stop = self._slices[w]
+            final_obs[start:stop] = self._last_obs[start:stop]
+            rewards[start:stop] = 0
+            dones[start:stop] = True
+
+        infos = {}
+        if dones.any():
+            infos["final_observation"] = final_obs[dones].copy()
+            infos["_final_observation"] = dones.copy()
+        if restarted:
+            infos["restarted_workers"] = restarted
+        self._last_obs = obs
+        return obs.copy(), rewards, dones, infos
+
+    def get_invalid_action_mask(self) -> numpy.ndarray:
+        """
+        Returns a (num_envs, num_actions) array that is True for the actions
+        that would be valid in each game
+        """
+        return self._arrays.masks.copy()
+
+    def close(self):
+        if self.closed:
+            return
+        # workers that were never started are None
+        remotes = [remote for remote in self._remotes if remote is not None]
+        for remote in remotes:
+            try:
+                remote.send(("close", None))
+            except (BrokenPipeError, EOFError, OSError):
+                pass
+        for process in self._processes:
+            if process is None:
+                continue
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        for remote in remotes:
+            remote.close()
+        self.closed = True
+
+    def _worker_seed(self, w: int) -> Optional[int]:
+        if self.seed is None:
+            return None
+        return self.seed + w + self._restarts[w] * self.num_workers
+
+    def _record_path(self, w: int) -> Optional[str]:
+        if self.record_dir is None:
+            return None
+        return os.path.join(self.record_dir, f"worker{w}.episodes")
+
+    def _start_worker(self, w: int):
+        """
+        Starts (or restarts) worker w and waits for its games to be reset
+        """
+        start, stop = self._slices[w]
+        remote, work_remote = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker,
+            args=(
+                work_remote,
+                remote,
+                self._buffers,
+                self.num_envs,
+                start,
+                stop,
+                self.env_kwargs,
+                self._worker_seed(w),
+                self._record_path(w),
+            ),
+            daemon=True,
+        )
+        process.start()
+        work_remote.close()
+        self._processes[w] = process
+        self._remotes[w] = remote
+        try:
+            self._receive(w)
+        except (EOFError, ConnectionResetError, BrokenPipeError):
+            exitcode = self._stop_worker(w)
+            raise RuntimeError(
+                f"worker {w} exited with code {exitcode} before its games were reset"
+            ) from None
+
+    def _stop_worker(self, w: int) -> Optional[int]:
+        """
+        Closes the pipe to worker w, makes sure it has exited
+        and returns its exit code
+        """
+        self._remotes[w].close()
+        process = self._processes[w]
+        process.join(timeout=1)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+        return process.exitcode
+
+    def _receive(self, w: int):
+        """
+        Waits for a reply from worker w. Raises EOFError if the worker died
+        """
+        remote = self._remotes[w]
+        while not remote.poll(1):
+            if not self._processes[w].is_alive():
+                raise EOFError(f"worker {w} died")
+        return remote.recv()
+
+    def _run(self, command: str, data: list) -> List[int]:
+        """
+        Sends a command to every worker and waits for all of them to finish it.
+        Returns the workers that died and were restarted.
+        """
+        died = set()
+        for w, remote in enumerate(self._remotes):
+            try:
+                remote.send((command, data[w]))
+            except (BrokenPipeError, ConnectionResetError, EOFError):
+                died.add(w)
+
+        restarted = []
+        for w in range(self.num_workers):
+            if w not in died:
+                try:
+                    self._receive(w)
+                    continue
+                except (EOFError, ConnectionResetError, BrokenPipeError):
+                    pass
+            exitcode = self._stop_worker(w)
+            if self._restarts[w] >= self.max_restarts:
+                raise RuntimeError(
+                    f"worker {w} exited with code {exitcode} after being restarted "
+                    f"{self._restarts[w]} times"
+                )
+            self._restarts[w] += 1
+            self._start_worker(w)
+            restarted.append(w)
+        return restarted
+
+    def __del__(self):
+        if not getattr(self, "closed", True):
+            self.close()
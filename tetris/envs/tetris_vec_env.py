@@ -0,0 +1,401 @@
+from typing import Optional
+from gym import spaces
+import numpy
+from tetris.envs.game.constants import *
+from tetris.envs.game.piece import *
+from tetris.envs.tetris_env import OBS_DIM, PIECE_TO_NUMBER
+
+
+# piece types, indexed by their observation number - 1
+PIECE_TYPES = tuple(
+    T for T, val in sorted(PIECE_TO_NUMBER.items(), key=lambda item: item[1]) if val
+)
+NUM_PIECE_TYPES = len(PIECE_TYPES)
+
+GRID_WIDTH, GRID_HEIGHT = PLAYER_GRID_DIMENSIONS
+START_X, START_Y = BLOCK_START
+
+
+def _build_piece_tables():
+    """
+    Gathers the cell offsets of every rotation of every piece type.
+    Offsets are relative to an anchor that does not move when the piece rotates,
+    where the anchor is the top left of the piece in its spawn rotation.
+    """
+    offsets = numpy.zeros((NUM_PIECE_TYPES, 4, 4, 2), dtype=numpy.int64)
+    rotates = numpy.zeros(NUM_PIECE_TYPES, dtype=bool)
+    for t, piece_type in enumerate(PIECE_TYPES):
+        rotates[t] = piece_type.SPAWN_ROTATE_CENTER is not None
+        for r, state in enumerate(piece_type.ROTATIONS):
+            offsets[t, r] = numpy.add(state.arrangement, state.offset)
+    return offsets, rotates
+
+
+PIECE_OFFSETS, PIECE_ROTATES = _build_piece_tables()
+SPARSE_REWARDS = numpy.sin(
+    numpy.pi
+    * 0.5
+    * numpy.array([LINE_CLEAR_SCORES[i] for i in range(5)], dtype=numpy.float64)
+    / 800
+)
+
+
+class TetrisVecEnv:
+    """
+    Runs num_envs games of tetris as stacked NumPy arrays,
+    advancing all of them with a single batched call per step.
+    Follows the same rules, observations and action numbering as TetrisEnv.
+    Games that end are reset automatically.
+    """
+
+    metadata = {
+        "reward_modes": ["sparse", "sparsev2"],
+        "step_modes": ["positive", "negative", "none"],
+    }
+
+    def __init__(
+        self,
+        num_envs: int,
+        reward_mode: Optional[str] = None,
+        step_mode: Optional[str] = None,
+        max_timesteps: Optional[int] = 5000,
+        penalize_illegal: Optional[bool] = True,
+        illegal_penalty: Optional[int] = -10,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.num_envs = num_envs
+        self.single_action_space = spaces.Discrete(NUM_ACTIONS)
+        self.single_observation_space = spaces.Box(0, 7, (OBS_DIM,), dtype=numpy.int64)
+        self.action_space = spaces.MultiDiscrete([NUM_ACTIONS] * num_envs)
+        self.observation_space = spaces.Box(
+            0, 7, (num_envs, OBS_DIM), dtype=numpy.int64
+        )
+
+        if (
+            reward_mode is not None
+            and reward_mode in TetrisVecEnv.metadata["reward_modes"]
+        ):
+            self.reward_mode = reward_mode
+        else:
+            self.reward_mode = "sparse"  # sparse is default
+        if step_mode is not None and step_mode in TetrisVecEnv.metadata["step_modes"]:
+            self.step_mode = step_mode
+        else:
+            self.step_mode = "positive"  # positive step by default
+        self.step_reward = {"positive": 0.001, "negative": -0.001, "none": 0}[
+            self.step_mode
+        ]
+        self.line_clear_rewards = SPARSE_REWARDS * (
+            100 if self.reward_mode == "sparsev2" else 1
+        )
+
+        self.penalize_illegal = penalize_illegal
+        self.illegal_penalty = illegal_penalty
+        self.max_timesteps = max_timesteps
+
+        self.rng = numpy.random.default_rng(seed)
+        self._env_idx = numpy.arange(num_envs)
+
+        # game state
+        self.board = numpy.zeros((num_envs, GRID_HEIGHT, GRID_WIDTH), dtype=bool)
+        self.piece_type = numpy.zeros(num_envs, dtype=numpy.int64)
+        self.rotation = numpy.zeros(num_envs, dtype=numpy.int64)
+        self.x = numpy.zeros(num_envs, dtype=numpy.int64)
+        self.y = numpy.zeros(num_envs, dtype=numpy.int64)
+        self.held_type = numpy.zeros(num_envs, dtype=numpy.int64)
+        self.held_rotation = numpy.zeros(num_envs, dtype=numpy.int64)
+        self.holdable = numpy.zeros(num_envs, dtype=bool)
+        self.next_pieces = numpy.zeros((num_envs, 3), dtype=numpy.int64)
+        self.executions = numpy.zeros(num_envs, dtype=numpy.int64)
+        self.score = numpy.zeros(num_envs, dtype=numpy.int64)
+        self.lines_just_cleared = numpy.zeros(num_envs, dtype=numpy.int64)
+        self.total_lines_cleared = numpy.zeros(num_envs, dtype=numpy.int64)
+        self.run = numpy.zeros(num_envs, dtype=bool)
+        self.valid_last_move = numpy.zeros(num_envs, dtype=bool)
+        self.cur_timesteps = numpy.zeros(num_envs, dtype=numpy.int64)
+
+    def reset(self, seed=None, return_info=False, options=None):
+        if seed is not None:
+            self.rng = numpy.random.default_rng(seed)
+        self._reset_games(numpy.ones(self.num_envs, dtype=bool))
+
+        if return_info:
+            return self._get_obs(), {}
+        return self._get_obs()
+
+    def step(self, actions):
+        """
+        Advances every game by one tick.
+        Returns (observations, rewards, dones, infos), where infos holds the
+        observations that finished games ended on, since those games are
+        reset before returning.
+        """
+        actions = numpy.asarray(actions, dtype=numpy.int64).reshape(self.num_envs)
+
+        self.valid_last_move[:] = True
+        self._hold_pieces(actions == ACTION_HOLD)
+        out = self._move_pieces(actions)
+        self.executions += 1
+
+        if out.any():
+            self._get_next_pieces(out)
+            self.executions[out] = STEPS_BETWEEN_DOWNS // 2
+
+        gravity = self.run & (self.executions == STEPS_BETWEEN_DOWNS)
+        if gravity.any():
+            self.executions[gravity] = 0
+            can_fall = gravity & ~self._collides(
+                self.piece_type, self.rotation, self.x, self.y + 1
+            )
+            self.y[can_fall] += 1
+            landed = gravity & ~can_fall
+            if landed.any():
+                self._get_next_pieces(landed)
+                self.executions[landed] = STEPS_BETWEEN_DOWNS // 2
+
+        self.cur_timesteps += 1
+        self.run &= self.cur_timesteps < self.max_timesteps
+
+        obs = self._get_obs()
+        rewards = self._get_rewards()
+        dones = ~self.run
+        infos = {}
+        if dones.any():
+            infos["final_observation"] = obs[dones]
+            infos["_final_observation"] = dones.copy()
+            self._reset_games(dones)
+            obs[dones] = self._get_obs()[dones]
+        return obs, rewards, dones, infos
+
+    def get_invalid_action_mask(self) -> numpy.ndarray:
+        """
+        Returns a (num_envs, 8) array that is True for the actions
+        that would be valid in each game
+        """
+        mask = numpy.ones((self.num_envs, NUM_ACTIONS), dtype=bool)
+        t, r, x, y = self.piece_type, self.rotation, self.x, self.y
+        rotates = PIECE_ROTATES[t]
+        mask[:, ACTION_SPIN_RIGHT] = rotates & ~self._collides(t, (r + 1) % 4, x, y)
+        mask[:, ACTION_SPIN_LEFT] = rotates & ~self._collides(t, (r + 3) % 4, x, y)
+        mask[:, ACTION_LEFT] = ~self._collides(t, r, x - 1, y)
+        mask[:, ACTION_RIGHT] = ~self._collides(t, r, x + 1, y)
+        mask[:, ACTION_SOFT_DROP] = ~self._collides(t, r, x, y + 1)
+        mask[:, ACTION_HARD_DROP] = mask[:, ACTION_SOFT_DROP]
+        mask[:, ACTION_HOLD] = self.holdable
+        return mask
+
+    def close(self):
+        self.run[:] = False
+
+    def _reset_games(self, games: numpy.ndarray):
+        """
+        Resets the games selected by the given boolean mask
+        """
+        count = int(games.sum())
+        self.board[games] = False
+        self.next_pieces[games] = self.rng.integers(
+            0, NUM_PIECE_TYPES, size=(count, 3)
+        )
+        self.held_type[games] = -1
+        self.held_rotation[games] = 0
+        self.holdable[games] = True
+        self.executions[games] = 0
+        self.score[games] = 0
+        self.lines_just_cleared[games] = 0
+        self.total_lines_cleared[games] = 0
+        self.run[games] = True
+        self.valid_last_move[games] = True
+        self.cur_timesteps[games] = 0
+        self._spawn(games, self._pop_next_pieces(games), 0)
+
+    def _pop_next_pieces(self, games: numpy.ndarray) -> numpy.ndarray:
+        """
+        Takes the next piece of the selected games, refilling their queues
+        """
+        ret = self.next_pieces[games, 0]
+        self.next_pieces[games, :-1] = self.next_pieces[games, 1:]
+        self.next_pieces[games, -1] = self.rng.integers(
+            0, NUM_PIECE_TYPES, size=len(ret)
+        )
+        return ret
+
+    def _spawn(self, games: numpy.ndarray, piece_types, rotations):
+        """
+        Puts the given pieces at the start position of the selected games.
+        Like TetrisGame, a piece keeps its rotation when it comes out of the holder.
+        """
+        self.piece_type[games] = piece_types
+        self.rotation[games] = rotations
+        self.x[games] = START_X
+        self.y[games] = START_Y
+        anchor = PIECE_OFFSETS[self.piece_type[games], self.rotation[games]].min(
+            axis=1
+        )
+        self.x[games] -= anchor[:, 0]
+        self.y[games] -= anchor[:, 1]
+
+    def _collides(self, piece_type, rotation, x, y, idx=None) -> numpy.ndarray:
+        """
+        Returns whether each game's piece would overlap a filled space
+        or leave the grid if it had the given type, rotation and anchor.
+        idx selects the games being checked, defaulting to all of them.
+        """
+        if idx is None:
+            idx = self._env_idx
+        offsets = PIECE_OFFSETS[piece_type, rotation]
+        xs = offsets[:, :, 0] + x[:, None]
+        ys = offsets[:, :, 1] + y[:, None]
+        outside = (xs < 0) | (xs >= GRID_WIDTH) | (ys < 0) | (ys >= GRID_HEIGHT)
+        filled = self.board[
+            idx[:, None],
+            numpy.clip(ys, 0, GRID_HEIGHT - 1),
+            numpy.clip(xs, 0, GRID_WIDTH - 1),
+        ]
+        return (outside | filled).any(axis=1)
+
+    def _hold_pieces(self, holding: numpy.ndarray):
+        """
+        Swaps the current piece with the held piece in the selected games
+        """
+        self.valid_last_move &= ~(holding & ~self.holdable)
+        holding = holding & self.holdable
+        if not holding.any():
+            return
+
+        cur_type = self.piece_type[holding]
+        cur_rotation = self.rotation[holding]
+        had_held = numpy.zeros(self.num_envs, dtype=bool)
+        had_held[holding] = self.held_type[holding] >= 0
+
+        self._spawn(had_held, self.held_type[had_held], self.held_rotation[had_held])
+
+        # nothing was held, so the next piece comes out
+        fresh = holding & ~had_held
+        if fresh.any():
+            self._spawn(fresh, self._pop_next_pieces(fresh), 0)
+            self.run[fresh] &= ~self._collides(
+                self.piece_type[fresh],
+                self.rotation[fresh],
+                self.x[fresh],
+                self.y[fresh],
+                self._env_idx[fresh],
+            )
+
+        self.held_type[holding] = cur_type
+        self.held_rotation[holding] = cur_rotation
+        self.holdable[holding] = False
+
+    def _move_pieces(self, actions: numpy.ndarray) -> numpy.ndarray:
+        """
+        Applies the movement actions.
+        Returns which pieces were hard dropped
+        """
+        t, r, x, y = self.piece_type, self.rotation, self.x, self.y
+
+        # every action other than a hard drop is a single candidate position
+        new_r = r.copy()
+        new_x = x.copy()
+        new_y = y.copy()
+        spin_right = actions == ACTION_SPIN_RIGHT
+        spin_left = actions == ACTION_SPIN_LEFT
+        new_r[spin_right] = (r[spin_right] + 1) % 4
+        new_r[spin_left] = (r[spin_left] + 3) % 4
+        new_x[actions == ACTION_LEFT] -= 1
+        new_x[actions == ACTION_RIGHT] += 1
+        soft_drop = actions == ACTION_SOFT_DROP
+        new_y[soft_drop] += 1
+        self.score[soft_drop] += SOFT_DROP_SCORE
+
+        moving = (
+            spin_right
+            | spin_left
+            | soft_drop
+            | (actions == ACTION_LEFT)
+            | (actions == ACTION_RIGHT)
+        )
+        moved = (
+            moving
+            & ~self._collides(t, new_r, new_x, new_y)
+            & (PIECE_ROTATES[t] | ~(spin_right | spin_left))
+        )
+        self.rotation[moved] = new_r[moved]
+        self.x[moved] = new_x[moved]
+        self.y[moved] = new_y[moved]
+        self.valid_last_move &= moved | ~moving
+
+        # hard drops fall until they hit something
+        out = actions == ACTION_HARD_DROP
+        if out.any():
+            falling = out.copy()
+            dropped = numpy.zeros(self.num_envs, dtype=numpy.int64)
+            while falling.any():
+                falling &= ~self._collides(t, r, x, y + dropped + 1)
+                dropped[falling] += 1
+            self.y[out] += dropped[out]
+            self.score[out] += HARD_DROP_SCORE * dropped[out]
+            self.valid_last_move &= ~out | (dropped > 0)
+        return out
+
+    def _get_next_pieces(self, games: numpy.ndarray):
+        """
+        Locks the current pieces of the selected games into their boards,
+        clears full rows and brings out the next pieces
+        """
+        idx = self._env_idx[games]
+        offsets = PIECE_OFFSETS[self.piece_type[idx], self.rotation[idx]]
+        xs = offsets[:, :, 0] + self.x[idx, None]
+        ys = offsets[:, :, 1] + self.y[idx, None]
+        self.board[idx[:, None], ys, xs] = True
+
+        # clear full rows by moving them to the top and emptying them
+        full = self.board[idx].all(axis=2)
+        cleared = full.sum(axis=1)
+        clearing = cleared > 0
+        if clearing.any():
+            clear_idx = idx[clearing]
+            order = numpy.argsort(~full[clearing], axis=1, kind="stable")
+            boards = numpy.take_along_axis(
+                self.board[clear_idx], order[:, :, None], axis=1
+            )
+            boards[numpy.arange(GRID_HEIGHT)[None, :] < cleared[clearing, None]] = False
+            self.board[clear_idx] = boards
+
+        self.score[idx] += numpy.array(
+            [LINE_CLEAR_SCORES[i] for i in range(5)], dtype=numpy.int64
+        )[cleared]
+        self.lines_just_cleared[idx] = cleared
+        self.total_lines_cleared[idx] += cleared
+
+        self._spawn(games, self._pop_next_pieces(games), 0)
+        self.run[idx] &= ~self._collides(
+            self.piece_type[idx], self.rotation[idx], self.x[idx], self.y[idx], idx
+        )
+        self.holdable[games] = True
+
+    def _get_obs(self) -> numpy.ndarray:
+        """
+        Returns the observations of every game, laid out like TetrisEnv's
+        """
+        obs = numpy.empty((self.num_envs, OBS_DIM), dtype=numpy.int64)
+        grid = obs[:, : GRID_WIDTH * GRID_HEIGHT].reshape(
+            self.num_envs, GRID_HEIGHT, GRID_WIDTH
+        )
+        grid[:] = self.board
+
+        offsets = PIECE_OFFSETS[self.piece_type, self.rotation]
+        grid[
+            self._env_idx[:, None],
+            offsets[:, :, 1] + self.y[:, None],
+            offsets[:, :, 0] + self.x[:, None],
+        ] = 2
+
+        obs[:, -5] = self.held_type + 1
+        obs[:, -4] = self.holdable
+        obs[:, -3:] = self.next_pieces + 1
+        return obs
+
+    def _get_rewards(self) -> numpy.ndarray:
+        rewards = self.line_clear_rewards[self.lines_just_cleared] + self.step_reward
+        if self.penalize_illegal:
+            rewards[~self.valid_last_move] += self.illegal_penalty
+        return rewards